@@ -0,0 +1,162 @@
+import os
+import logging
+from collections import defaultdict
+
+import pgn_io
+
+"""
+AFFINITY.PY
+Привязка движков к физическим ядрам (cpu_affinity: true, только Linux).
+Без привязки планировщик ОС перекидывает потоки Stockfish между ядрами и SMT-соседями,
+и скорость одинаковых запусков заметно "гуляет" (особенно на двухпроцессорных серверах).
+
+Топология читается из /sys/devices/system/cpu/cpu*/topology: физическое ядро - группа
+логических CPU (SMT-соседей), ядра сгруппированы по процессорам (package).
+Каждый движок получает engine_threads своих физических ядер, по возможности в одном
+процессоре. С affinity_smt: false движку дается один логический CPU на ядро (второй
+поток ядра никому не отдается), с true - все SMT-соседи. Python (основной процесс,
+потоки и процессы разбора PGN) получает оставшиеся ядра. Раскладка всегда строится от
+исходной маски процесса, поэтому повторный setup (калибровка, новый пул) ее не сужает.
+"""
+
+CPU_ROOT = "/sys/devices/system/cpu"
+
+_original_cpus = None
+
+def _read(path):
+    with open(path, "r") as f:
+        return f.read().strip()
+
+def parse_cpu_list(text):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in text.split(","):
+        if not part: continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+def format_cpus(cpus):
+    """[0, 1, 2, 3, 8] -> '0-3,8'"""
+    parts = []
+    for cpu in sorted(cpus):
+        if parts and parts[-1][1] == cpu - 1: parts[-1][1] = cpu
+        else: parts.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in parts)
+
+def read_topology(root=CPU_ROOT, allowed=None):
+    """
+    Физические ядра: [(процессор, [логические CPU ядра])] по порядку процессоров и ядер.
+    allowed - доступные процессу CPU (остальные не учитываются).
+    """
+    cores = {}
+    for name in os.listdir(root):
+        if not (name.startswith("cpu") and name[3:].isdigit()): continue
+        cpu = int(name[3:])
+        if allowed is not None and cpu not in allowed: continue
+        topo = os.path.join(root, name, "topology")
+        if not os.path.isdir(topo): continue  # CPU выключен
+        package = int(_read(os.path.join(topo, "physical_package_id")))
+        siblings = parse_cpu_list(_read(os.path.join(topo, "thread_siblings_list")))
+        key = (package, min(siblings))
+        cores.setdefault(key, set()).add(cpu)
+    return [(package, sorted(cpus)) for (package, _), cpus in sorted(cores.items())]
+
+def plan(cores, engines, threads, smt=False):
+    """
+    Распределение ядер: ([множество CPU каждого движка], множество CPU для Python)
+    или None, если ядер не хватает (движкам нужны все ядра и еще одно для Python).
+    """
+    if engines * threads >= len(cores): return None
+    free = defaultdict(list)
+    for package, cpus in cores:
+        free[package].append(cpus)
+
+    engine_cpus = []
+    for _ in range(engines):
+        # Движок целиком в одном процессоре, если где-то хватает свободных ядер
+        fits = [p for p in sorted(free) if len(free[p]) >= threads]
+        order = fits[:1] + [p for p in sorted(free) if p not in fits[:1]]
+        taken = []
+        for package in order:
+            while free[package] and len(taken) < threads:
+                taken.append(free[package].pop(0))
+        engine_cpus.append({cpu for cpus in taken for cpu in (cpus if smt else cpus[:1])})
+
+    python_cpus = {cpu for package in free for cpus in free[package] for cpu in cpus}
+    return engine_cpus, python_cpus
+
+def _tasks(pid):
+    task_dir = f"/proc/{pid}/task"
+    return [int(t) for t in os.listdir(task_dir)] if os.path.isdir(task_dir) else [pid]
+
+def _children(pid):
+    """Дочерние процессы pid (/proc/pid/task/*/children)."""
+    children = []
+    for tid in _tasks(pid):
+        try: children.extend(int(c) for c in _read(f"/proc/{pid}/task/{tid}/children").split())
+        except OSError: continue
+    return children
+
+def pin(pid, cpus, children=False):
+    """Привязывает все потоки процесса pid (/proc/pid/task) к cpus, с children - и его дочерние процессы."""
+    for tid in _tasks(pid):
+        try: os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError: pass  # Поток уже завершился
+    if children:
+        for child in _children(pid): pin(child, cpus, children=True)
+
+def original_cpus():
+    """CPU, доступные процессу до привязки (маска запоминается при первом вызове)."""
+    global _original_cpus
+    if _original_cpus is None: _original_cpus = set(os.sched_getaffinity(0))
+    return _original_cpus
+
+def _pin_python(cpus):
+    # Процессы разбора PGN могли быть запущены раньше (поиск учеников) - их тоже,
+    # а новые процессы пула привязываются в pgn_io._init_worker
+    pin(os.getpid(), cpus, children=True)
+    pgn_io.set_worker_cpus(cpus)
+
+def available_cores():
+    """Физические ядра, доступные процессу до привязки (read_topology), или None, если привязка невозможна."""
+    if not hasattr(os, "sched_setaffinity") or not os.path.isdir(CPU_ROOT):
+        logging.warning("cpu_affinity: привязка к ядрам поддерживается только в Linux, отключена")
+        return None
+    try:
+        return read_topology(CPU_ROOT, original_cpus())
+    except (OSError, ValueError) as e:
+        logging.warning(f"cpu_affinity: не удалось прочитать топологию CPU ({e}), привязка отключена")
+        return None
+
+def setup(config, engines):
+    """
+    Строит и применяет привязку для engines движков: Python - сразу, движкам - при
+    запуске (engine_pool.launch_engine). Возвращает список CPU движков или None (привязки нет).
+    """
+    if not config.get("cpu_affinity", False): return None
+    cores = available_cores()
+    if cores is None: return None
+
+    threads = max(1, config.get("engine_threads", 1))
+    placement = plan(cores, engines, threads, config.get("affinity_smt", False))
+    if placement is None:
+        logging.warning(f"cpu_affinity: нужно физических ядер {engines * threads + 1} (движков {engines} "
+                        f"по {threads} и одно для Python), доступно {len(cores)} - привязка отключена")
+        # Прошлый setup мог привязать Python - возвращаем исходную маску
+        try: _pin_python(original_cpus())
+        except OSError: pass
+        return None
+
+    engine_cpus, python_cpus = placement
+    try:
+        _pin_python(python_cpus)
+    except OSError as e:
+        logging.warning(f"cpu_affinity: не удалось привязать процесс ({e}), привязка отключена")
+        return None
+    packages = len({package for package, _ in cores})
+    logging.info(f"Привязка к ядрам: физических ядер {len(cores)}, процессоров {packages}")
+    for i, cpus in enumerate(engine_cpus):
+        logging.info(f"   engine-{i+1}: CPU {format_cpus(cpus)}")
+    logging.info(f"   Python: CPU {format_cpus(python_cpus)}")
+    return engine_cpus
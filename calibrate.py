@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import logging
+import chess
+import chess.engine
+
+import affinity
+import chess_analyze
+import engine_pool
+import pgn_io
+
+"""
+CALIBRATE.PY
+Подбор engine_workers / engine_threads / engine_hash под конкретную машину.
+Берет выборку позиций из input_folder (или встроенный набор, если папка пуста),
+считает ее на глубине engine_depth при разных настройках и измеряет позиций в секунду:
+
+    1. Делим ядра между движками: 1 движок x N потоков, 2 x N/2, ... N x 1 (делители N).
+       С cpu_affinity N - физические ядра без одного: его affinity.plan оставляет Python.
+    2. Для лучшего деления пробуем размеры хеша из calibration_hash.
+
+Лучшие настройки записываются в config.suggested.json рядом с config.json
+(сам config.json не меняется).
+"""
+
+# Позиции из bench Stockfish - на случай, если своих партий еще нет
+BUILTIN_FENS = [
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10",
+    "4rrk1/pp1n3p/3q2pQ/2p1pb2/2PP4/2P3N1/P2B2PP/4RRK1 b - - 7 19",
+    "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15",
+    "r1bbk1nr/pp3p1p/2n5/1N4p1/2Np1B2/8/PPP2PPP/2KR1B1R w kq - 0 13",
+    "r1bq1rk1/ppp1nppp/4n3/3p3Q/3P4/1BP1B3/PP1N2PP/R4RK1 w - - 1 16",
+    "4r1k1/r1q2ppp/ppp2n2/4P3/5Rb1/1N1BQ3/PPP3PP/R5K1 w - - 1 17",
+    "2rqkb1r/ppp2p2/2npb1p1/1N1Nn2p/2P1PP2/8/PP2B1PP/R1BQK2R b KQ - 0 11",
+    "r1bq1r1k/b1p1npp1/p2p3p/1p6/3PP3/1B2NN2/PP3PPP/R2Q1RK1 w - - 1 16",
+    "3r1rk1/p5pp/bpp1pp2/8/q1PP1P2/b3P3/P2NQRPP/1R2B1K1 b - - 6 22",
+    "r1q2rk1/2p1bppp/2Pp4/p6b/Q1PNp3/4B3/PP1R1PPP/2K4R w - - 2 18",
+    "4k2r/1pb2ppp/1p2p3/1R1p4/3P4/2r1PN2/P4PPP/1R4K1 b - - 3 22",
+    "3q2k1/pb3p1p/4pbp1/2r5/PpN2N2/1P2P2P/5PP1/Q2R2K1 b - - 4 26",
+]
+
+SKIP_PLIES = 10   # Первые ходы партии (дебютная теория) в выборку не берем
+EVERY_PLY = 3     # Берем каждую третью позицию, чтобы выборка покрывала больше партий
+MIN_GAIN = 1.05   # Менять текущие настройки, только если новые быстрее хотя бы на 5% (иначе это шум)
+
+# --- ВЫБОРКА ---
+
+def sample_positions(config, input_folder, count):
+    """Список (board, move) из партий input_folder; при нехватке - встроенный набор."""
+    sample = []
+    for path in chess_analyze.get_pgn_files(input_folder):
+        for game in pgn_io.read_games(path, config.get("pgn_workers", 1), mainline_only=True, comments="none"):
+            board = game.board()
+            for i, move in enumerate(game.mainline_moves()):
+                if i >= SKIP_PLIES and i % EVERY_PLY == 0:
+                    sample.append((board.copy(), move))
+                    if len(sample) >= count: return sample
+                board.push(move)
+    if not sample:
+        logging.info("Партий в input_folder нет - калибровка на встроенном наборе позиций")
+        for fen in BUILTIN_FENS:
+            board = chess.Board(fen)
+            sample.append((board, min(board.legal_moves, key=lambda m: m.uci())))
+    return sample
+
+# --- КАНДИДАТЫ ---
+
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"): return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+def core_splits(cores, reserved=0):
+    """(движков, потоков) так, чтобы движки x потоки = все ядра, кроме reserved (оставлены для Python)."""
+    cores = max(1, cores - reserved)
+    return [(w, cores // w) for w in range(1, cores + 1) if cores % w == 0]
+
+def measure(config, sample, workers, threads, hash_mb):
+    """Позиций в секунду при заданных настройках (None, если были ошибки движка)."""
+    cfg = dict(config, engine_workers=workers, engine_threads=threads, engine_hash=hash_mb)
+    limit = chess.engine.Limit(depth=config["engine_depth"])
+    pool = engine_pool.EnginePool(cfg)
+    try:
+        jobs = [(i, board, move) for i, (board, move) in enumerate(sample)]
+        t0 = time.perf_counter()
+        evals = chess_analyze.evaluate_jobs(jobs, pool.engines, limit)
+        elapsed = time.perf_counter() - t0
+    finally:
+        pool.close()
+    errors = sum(1 for ev in evals.values() if "error" in ev)
+    if errors:
+        logging.warning(f"   {workers} x {threads} потоков, хеш {hash_mb} МБ: ошибок движка {errors}")
+        return None
+    rate = len(sample) / elapsed if elapsed > 0 else 0.0
+    logging.info(f"   {workers} x {threads} потоков, хеш {hash_mb} МБ: {rate:.2f} позиций/с")
+    return rate
+
+# --- ЗАПУСК ---
+
+def run(config, config_path, input_folder):
+    cores = len(affinity.original_cpus()) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    reserved = 0
+    if config.get("cpu_affinity", False):
+        # С привязкой движки делят физические ядра, и одно ядро остается Python (affinity.plan)
+        topology = affinity.available_cores()
+        if topology is not None: cores, reserved = len(topology), 1
+    count = config.get("calibration_positions", 100)
+    sample = sample_positions(config, input_folder, count)
+    memory = available_memory_mb()
+    logging.info(f"Калибровка: ядер {cores}, свободной памяти {memory or '?'} МБ, "
+                 f"позиций {len(sample)}, глубина {config['engine_depth']}")
+
+    def fits(workers, hash_mb):
+        # Хеш всех движков не должен занимать больше половины свободной памяти
+        return memory is None or workers * hash_mb <= memory // 2
+
+    results = {}
+    base_hash = config.get("engine_hash", 16)
+    logging.info("1. Деление ядер между движками:")
+    for workers, threads in core_splits(cores, reserved):
+        hash_mb = base_hash if fits(workers, base_hash) else max(16, memory // 2 // workers)
+        rate = measure(config, sample, workers, threads, hash_mb)
+        if rate is not None: results[(workers, threads, hash_mb)] = rate
+    if not results:
+        logging.error("Калибровка не удалась: движок не смог посчитать выборку"); return None
+
+    workers, threads, _ = max(results, key=results.get)
+    logging.info(f"2. Размер хеша для {workers} x {threads}:")
+    for hash_mb in config.get("calibration_hash", [16, 64, 256, 1024]):
+        if (workers, threads, hash_mb) in results or not fits(workers, hash_mb): continue
+        rate = measure(config, sample, workers, threads, hash_mb)
+        if rate is not None: results[(workers, threads, hash_mb)] = rate
+
+    best = max(results, key=results.get)
+    current = (config.get("engine_workers", 1), config.get("engine_threads", 1), base_hash)
+    if current in results and results[best] < results[current] * MIN_GAIN:
+        best = current
+    suggested = dict(config, engine_workers=best[0], engine_threads=best[1], engine_hash=best[2])
+    out_path = os.path.join(os.path.dirname(os.path.abspath(config_path)), "config.suggested.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(suggested, f, ensure_ascii=False, indent=2)
+
+    logging.info(f"Лучшее: engine_workers={best[0]}, engine_threads={best[1]}, engine_hash={best[2]} "
+                 f"({results[best]:.2f} позиций/с)")
+    if current in results:
+        logging.info(f"Текущие настройки: {results[current]:.2f} позиций/с")
+    logging.info(f"Предложенный конфиг: {out_path}")
+    return best
@@ -1,17 +1,52 @@
 import sys
 import os
 import json
+import argparse
+import threading
+import time
 import logging
+import importlib.util
+from collections import Counter, deque
+from contextlib import nullcontext
+
 import chess
-import chess.pgn
-import chess.engine
-from collections import Counter
+import state
+import sketch
+import slowlog
+import filters
+
+def lazy_import(name):
+    """
+    Модуль загружается при первом обращении к его атрибуту (importlib.util.LazyLoader).
+    Команды report/students не запускают движок и не разбирают партии, поэтому
+    не платят за импорт chess.engine (asyncio) и модулей классификации.
+    """
+    if name in sys.modules: return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent: setattr(sys.modules[parent], child, module)
+    return module
+
+lazy_import("chess.engine")
+lazy_import("chess.pgn")
 
 # Импорт наших модулей
-import utils
-import opening
-import middlegame
-import registry
+utils = lazy_import("utils")
+opening = lazy_import("opening")
+middlegame = lazy_import("middlegame")
+registry = lazy_import("registry")
+move_records = lazy_import("move_records")
+metrics = lazy_import("metrics")
+evalstore = lazy_import("evalstore")
+pgn_io = lazy_import("pgn_io")
+engine_pool = lazy_import("engine_pool")
+
+# Позиций, которые движок забирает из очереди партии за раз (для конвейера облегченного клиента)
+EVAL_BATCH = 8
 
 # Настройка логгера будет происходить после загрузки конфига
 def setup_logging(output_folder):
@@ -50,54 +85,149 @@ def get_pgn_files(input_folder):
         return []
 
     for f in os.listdir(input_folder):
-        if f.endswith(".pgn"):
+        if pgn_io.is_pgn_file(f):
             files.append(os.path.join(input_folder, f))
     return files
 
+def read_file_games(path, config):
+    """
+    Партии файла для анализа (pgn_io.read_games): фильтр по заголовкам (filters.py).
+    pgn_mainline_only и pgn_comments по умолчанию выключены: без них исходные варианты,
+    комментарии и NAG переносятся в результат без потерь. Отброшенные - None.
+    """
+    return pgn_io.read_games(path, config.get("pgn_workers", 1), filters.from_config(config),
+                             config.get("pgn_mainline_only", False), config.get("pgn_comments", "all"))
+
+def read_file_games_at(path, locations, config):
+    """Партии файла по адресам pgn_io.locate_headers, с теми же настройками разбора, что read_file_games."""
+    return pgn_io.read_games_at(path, locations, filters.from_config(config),
+                                config.get("pgn_mainline_only", False), config.get("pgn_comments", "all"))
+
 def normalize_name(name):
     return name.strip().lower() if name else "unknown"
 
-def find_all_students(pgn_files, config):
+def get_target_filter(config):
+    """Множество имен для подсчета (только forced_students при trigger=0) или None (все)."""
+    if config.get("student_game_count_trigger", 6) == 0:
+        return {normalize_name(x) for x in config.get("forced_students", [])}
+    return None
+
+def count_players(path, config, target_filter=None, limit=None):
+    """
+    Считает партии игроков в одном файле (только по заголовкам, с учетом фильтра filters.py).
+    limit - предел числа разных игроков: при превышении чтение прерывается и возвращается None
+    (подсчет не вырастает больше limit записей).
+    """
+    player_counts = Counter()
+    workers = config.get("pgn_workers", 1)
+    for h in pgn_io.read_headers(path, workers, filters.from_config(config)):
+        if h is None: continue
+        w = normalize_name(h.get("White", "?"))
+        b = normalize_name(h.get("Black", "?"))
+        
+        if target_filter:
+            if w in target_filter: player_counts[w] += 1
+            if b in target_filter: player_counts[b] += 1
+        else:
+            player_counts[w] += 1
+            player_counts[b] += 1
+            if limit is not None and len(player_counts) > limit: return None
+    return player_counts
+
+def select_students(player_counts, config):
+    """Отбирает учеников из общего подсчета партий по порогу и forced_students."""
     threshold = config.get("student_game_count_trigger", 6)
-    forced_list = config.get("forced_students", [])
-    forced_set = {normalize_name(x) for x in forced_list}
+    forced_set = {normalize_name(x) for x in config.get("forced_students", [])}
+    
+    final_students = {}
+    if threshold > 0:
+        for name, count in player_counts.items():
+            if count > threshold or name in forced_set:
+                final_students[name] = count
+    else:
+        final_students = dict(player_counts)
+    return final_students
+
+def count_candidates(pgn_files, config, header_cache=None):
+    """
+    Подсчет игроков в ограниченной памяти для огромных архивов.
+    Первый проход по заголовкам: имена сразу идут в count-min sketch (оценка не меньше настоящей),
+    кандидаты - игроки с оценкой выше порога и forced_students. Второй проход точно считает
+    только кандидатов; в header_cache попадают только эти подсчеты (ключ - множество кандидатов).
+    Возвращает (подсчет, {путь: подсчет}) по кандидатам.
+    """
+    threshold = config.get("student_game_count_trigger", 6)
+    counter = sketch.CountMinSketch(config.get("count_sketch_width", 1 << 20))
+    candidates = {normalize_name(x) for x in config.get("forced_students", [])}
+    workers = config.get("pgn_workers", 1)
+    game_filter = filters.from_config(config)
+    for path in pgn_files:
+        try:
+            for h in pgn_io.read_headers(path, workers, game_filter):
+                if h is None: continue
+                for tag in ("White", "Black"):
+                    name = normalize_name(h.get(tag, "?"))
+                    if counter.add(name) > threshold: candidates.add(name)
+        except: continue
+    logging.info(f"Кандидатов: {len(candidates)} (sketch {counter.memory_mb:.0f} МБ)")
     
+    player_counts = Counter()
+    per_file = {}
+    if not candidates: return player_counts, per_file
+    game_key = filters.filter_key(config)
+    for path in pgn_files:
+        try:
+            counts = state.cached_players(header_cache, path, candidates, game_key) if header_cache is not None else None
+            if counts is None:
+                counts = count_players(path, config, candidates)
+                if header_cache is not None: state.store_players(header_cache, path, candidates, counts, game_key)
+        except: continue
+        player_counts.update(counts)
+        per_file[path] = counts
+    return player_counts, per_file
+
+def find_all_students(pgn_files, config, file_counts=None, header_cache=None):
+    """
+    Находит учеников по заголовкам всех файлов.
+    Если передан словарь file_counts, в него складывается подсчет по каждому файлу.
+    header_cache - кэш подсчета (state.load_headers_cache): неизмененные файлы не перечитываются.
+    """
     logging.info("Поиск учеников...")
     
-    if threshold == 0:
-        if not forced_set:
-            logging.error("Trigger=0 и forced_students пуст.")
-            return {}
-        target_filter = forced_set
-    else:
-        target_filter = None 
+    target_filter = get_target_filter(config)
+    if target_filter is not None and not target_filter:
+        logging.error("Trigger=0 и forced_students пуст.")
+        return {}
 
     player_counts = Counter()
+    per_file = {}
+    entries = 0
+    # Без фильтра считаются все игроки: если их слишком много, точный Counter не влезет в память.
+    # Предел проверяется во время чтения, поэтому даже один огромный файл не считается целиком.
+    limit = config.get("player_count_limit", 1000000) if target_filter is None else 0
+    game_key = filters.filter_key(config)
+    if game_key is not None: logging.info(f"Фильтр партий по заголовкам: {game_key}")
     
     for path in pgn_files:
         try:
-            with open(path, "r", encoding="utf-8", errors="replace") as f:
-                while True:
-                    h = chess.pgn.read_headers(f)
-                    if h is None: break
-                    w = normalize_name(h.get("White", "?"))
-                    b = normalize_name(h.get("Black", "?"))
-                    
-                    if target_filter:
-                        if w in target_filter: player_counts[w] += 1
-                        if b in target_filter: player_counts[b] += 1
-                    else:
-                        player_counts[w] += 1
-                        player_counts[b] += 1
+            counts = state.cached_players(header_cache, path, target_filter, game_key) if header_cache is not None else None
+            if counts is None:
+                counts = count_players(path, config, target_filter, limit - entries if limit else None)
+                # Переполненный подсчет (None) в кэш не попадает
+                if header_cache is not None and counts is not None:
+                    state.store_players(header_cache, path, target_filter, counts, game_key)
         except: continue
-
-    final_students = {}
-    if threshold > 0:
-        for name, count in player_counts.items():
-            if count > threshold or name in forced_set:
-                final_students[name] = count
-    else:
-        final_students = dict(player_counts)
+        if counts is None or (limit and entries + len(counts) > limit):
+            logging.info(f"Игроков больше {limit}: приблизительный подсчет и точный пересчет кандидатов")
+            player_counts = per_file = counts = None
+            player_counts, per_file = count_candidates(pgn_files, config, header_cache)
+            break
+        player_counts.update(counts)
+        per_file[path] = counts
+        entries += len(counts)
+    if file_counts is not None: file_counts.update(per_file)
+
+    final_students = select_students(player_counts, config)
 
     logging.info(f"Найдено учеников: {len(final_students)}")
     for name, cnt in final_students.items():
@@ -105,7 +235,12 @@ def find_all_students(pgn_files, config):
         
     return final_students
 
-def generate_reports(global_stats, output_folder):
+def generate_reports(global_stats, output_folder, progress=None, sampling=None):
+    """
+    Пишет Report_<имя>.txt для каждого ученика.
+    progress - {нормализованное имя: (проанализировано, всего партий)} для промежуточных отчетов.
+    sampling - {нормализованное имя: итог выборки} (sampling.summarize) для выборочного анализа.
+    """
     logging.info(f"Создание отчетов в папке {output_folder}...")
     for name, data in global_stats.items():
         safe = "".join([c for c in name if c.isalnum() or c in ' _-']).strip()
@@ -114,6 +249,9 @@ def generate_reports(global_stats, output_folder):
         
         with open(full_path, "w", encoding="utf-8") as f:
             f.write(f"ОТЧЕТ: {name}\n{'='*30}\n\n")
+            if progress is not None:
+                done, total = progress.get(normalize_name(name), (data["games"], data["games"]))
+                f.write(f"ПРОМЕЖУТОЧНЫЙ ОТЧЕТ: проанализировано {done} из {total} партий\n\n")
             
             f.write(f"1. ДЕБЮТ (Партий: {data['games']}):\n")
             if not data["op_errors"]: f.write("- Нет грубых ошибок.\n")
@@ -129,13 +267,142 @@ def generate_reports(global_stats, output_folder):
             
             f.write(f"\n4. ТЕХНИКА (Не выиграно с перевесом +10): {data['tech_errors']}\n")
 
-def process_game(game, engine, config, students_data, global_stats, tracking_info):
+            moves = data.get("moves", 0)
+            if moves:
+                f.write(f"\n5. ТОЧНОСТЬ (Оценено ходов: {moves}):\n")
+                f.write(f"   Средняя потеря (ACPL): {data['cpl_sum'] / moves:.0f}\n")
+                f.write(f"   Точность: {data['acc_sum'] / moves:.1f}%\n")
+                for phase, n in sorted(data["phase_moves"].items()):
+                    f.write(f"- {phase}: ACPL {data['phase_cpl'][phase] / n:.0f}, "
+                            f"точность {data['phase_acc'][phase] / n:.1f}% ({n} ходов)\n")
+
+            sample = (sampling or {}).get(normalize_name(name))
+            if sample:
+                f.write(f"\n6. ВЫБОРКА: проанализировано {sample['games']} из {sample['population']} партий\n")
+                f.write(f"   Ошибок за партию ({sample['confidence']:.0%} доверительный интервал):\n")
+                for k, (mean, half) in sample["rates"].items(): f.write(f"- {k}: {mean:.2f} ± {half:.2f}\n")
+
+def evaluate_position(engine, board, move, limit):
+    """Лучший ход + оценка сыгранного хода (если он не совпал с лучшим) и время обоих поисков."""
+    t0 = time.perf_counter()
+    info = engine.analyse(board, limit, multipv=1)
+    if isinstance(info, list): info = info[0]
+    played = None
+    if "pv" in info and info["pv"][0] != move:
+        played = engine.analyse(board, limit, root_moves=[move])
+    return {"info": info, "played": played, "elapsed": time.perf_counter() - t0}
+
+def evaluate_positions(engine, jobs, limit):
+    """
+    evaluate_position для пачки [(board, move)]. Если клиент движка умеет конвейер
+    (облегченный клиент), поиски отправляются ему пачкой: сначала лучшие ходы
+    всех позиций, затем сыгранные ходы там, где они не совпали с лучшими. Время позиции
+    в этом случае берется из отчета движка (поиски идут внахлест).
+    Если пачка не посчиталась, позиции пересчитываются по одной, чтобы ошибка одной
+    позиции не портила остальные. Отмена поиска (EngineSupervisor.cancel) пробрасывается.
+    Возвращает список dict ({"error": e}, если позицию посчитать не удалось).
+    """
+    if getattr(engine, "pipelined", hasattr(engine, "analyse_many")):
+        try:
+            return _evaluate_pipelined(engine, jobs, limit)
+        except engine_pool.EngineCancelled:
+            raise
+        except Exception as e:
+            logging.warning(f"Пачка из {len(jobs)} позиций не посчитана ({e!r}), пересчет по одной")
+    results = []
+    for board, move in jobs:
+        try: results.append(evaluate_position(engine, board, move, limit))
+        except engine_pool.EngineCancelled: raise
+        except Exception as e: results.append({"error": e})
+    return results
+
+def _evaluate_pipelined(engine, jobs, limit):
+    infos = engine.analyse_many([(board, limit, None) for board, move in jobs])
+    results = [{"info": info, "played": None} for info in infos]
+    second = [i for i, (board, move) in enumerate(jobs) if "pv" in infos[i] and infos[i]["pv"][0] != move]
+    played = engine.analyse_many([(jobs[i][0], limit, [jobs[i][1]]) for i in second])
+    for i, info in zip(second, played): results[i]["played"] = info
+    for r in results:
+        r["elapsed"] = r["info"].get("time", 0) + (r["played"].get("time", 0) if r["played"] else 0)
+    return results
+
+def evaluate_jobs(jobs, engines, limit):
+    """
+    Считает позиции jobs [(ключ, board, move)] на движках engines параллельно
+    (каждый движок забирает из общей очереди пачки по EVAL_BATCH).
+    Возвращает {ключ: dict из evaluate_positions}.
+    """
+    queue = deque(jobs)
+    evals = {}
+    lock = threading.Lock()
+
+    def worker(engine):
+        while True:
+            with lock:
+                batch = [queue.popleft() for _ in range(min(EVAL_BATCH, len(queue)))]
+            if not batch: return
+            results = evaluate_positions(engine, [(pos, move) for _, pos, move in batch], limit)
+            for (key, _, _), ev in zip(batch, results): evals[key] = ev
+
+    if len(engines) == 1:
+        worker(engines[0])
+    else:
+        threads = [threading.Thread(target=worker, args=(e,)) for e in engines]
+        for t in threads: t.start()
+        for t in threads: t.join()
+    return evals
+
+def collect_evals(game, engines, config, colors):
+    """
+    Фаза 1: оценки движка для всех ходов учеников (colors) в партии.
+    Позиции не зависят друг от друга, поэтому при нескольких движках
+    они делятся между ними и считаются параллельно.
+    Возвращает список по полуходам основной линии: dict или None (ход не анализируется).
+    """
+    limit = chess.engine.Limit(depth=config["engine_depth"])
+    jobs, ply_count = game_jobs(game, colors)
+    return assemble_evals(game, jobs, evaluate_jobs(jobs, engines, limit), ply_count)
+
+def game_jobs(game, colors):
+    """Позиции партии для движка: ([(полуход, board, move)] для ходов цветов colors, число полуходов)."""
+    jobs = []
     board = game.board()
-    node = game
-    
+    ply_count = 0
+    for move in game.mainline_moves():
+        if board.turn in colors: jobs.append((ply_count, board.copy(), move))
+        board.push(move)
+        ply_count += 1
+    return jobs, ply_count
+
+def assemble_evals(game, jobs, results, ply_count):
+    """Оценки {полуход: dict} -> список по полуходам (как collect_evals), медленные позиции - в журнал."""
+    evals = [None] * ply_count
+    for ply, ev in results.items(): evals[ply] = ev
+    gid = game_id(game)
+    for ply, pos, move in jobs:
+        if "elapsed" in evals[ply]: slowlog.engine(gid, ply, pos, move, evals[ply]["elapsed"], evals[ply]["info"])
+    return evals
+
+def game_id(game):
+    """Идентификатор партии для журналов: ссылка из Site или игроки, дата и тур."""
+    h = game.headers
+    site = h.get("Site", "")
+    if site.startswith("http"): return site
+    return f"{h.get('White', '?')} - {h.get('Black', '?')}, {h.get('Date', '?')}, тур {h.get('Round', '?')}"
+
+def process_game(game, engine, config, students_data, global_stats, tracking_info, move_log=None,
+                 evals=None, eval_sink=None):
+    """
+    Анализирует партию, добавляет в нее комментарии/варианты и пополняет global_stats.
+    engine - один движок или список движков (позиции партии считаются на них параллельно).
+    Если передан список move_log, в него складываются структурированные итоги по каждому
+    проанализированному ходу (для сервиса).
+    evals - сохраненные оценки (evalstore, повторная классификация): движок не вызывается.
+    eval_sink - список, в который кладутся оценки движка для сохранения.
+    Возвращает True, если в партии есть ученики.
+    """
     w_raw = game.headers.get('White', '?')
     b_raw = game.headers.get('Black', '?')
-    result = game.headers.get('Result', '*')
     
     w_norm = normalize_name(w_raw)
     b_norm = normalize_name(b_raw)
@@ -159,7 +426,8 @@ def process_game(game, engine, config, students_data, global_stats, tracking_inf
         s_total = tracking_info['total_students']
         tracking_info['student_progress'][norm_name] += 1
         p_curr = tracking_info['student_progress'][norm_name]
-        p_total = students_data.get(norm_name, '?')
+        # В выборке (sampling.py) итог - партии ученика после фильтра, а не все партии из заголовков
+        p_total = tracking_info.get('student_totals', students_data).get(norm_name, '?')
         log_parts.append(f"[Ученик {s_idx}/{s_total}] {raw_name} ({p_curr}/{p_total})")
 
     logging.info(f"Партия {gg_num}. {' | '.join(log_parts)}")
@@ -167,188 +435,357 @@ def process_game(game, engine, config, students_data, global_stats, tracking_inf
     # --- ИНИЦИАЛИЗАЦИЯ ---
     for raw_name, norm_name in active_students:
         if raw_name not in global_stats:
-            global_stats[raw_name] = {
-                "games": 0, "op_errors": Counter(), "tac_errors": Counter(), 
-                "strat_stats": Counter(), "tech_errors": 0
-            }
+            global_stats[raw_name] = state.new_student_stats()
         global_stats[raw_name]["games"] += 1
 
     op_trackers = {}
     if an_white: op_trackers[chess.WHITE] = {"center_control": False, "has_castled": False, "moved_pieces": set(), "target_center": [chess.E4, chess.D4], "checked": False}
     if an_black: op_trackers[chess.BLACK] = {"center_control": False, "has_castled": False, "moved_pieces": set(), "target_center": [chess.E5, chess.D5], "checked": False}
 
+    # --- ФАЗА 1: ОЦЕНКИ ДВИЖКА ---
+    if evals is None:
+        engines = engine if isinstance(engine, (list, tuple)) else [engine]
+        evals = collect_evals(game, engines, config, op_trackers.keys())
+        if eval_sink is not None: eval_sink.append(evals)
+
+    # --- ФАЗА 2: КЛАССИФИКАЦИЯ (строго по порядку ходов) ---
+    records = classify_moves(game, evals, config, op_trackers)
+
+    # --- ФАЗА 3: КОММЕНТАРИИ PGN И СТАТИСТИКА ---
+    render_game(game, records, global_stats, move_log)
+
+    # Точность и ACPL по всему ряду оценок партии сразу (без движка)
+    for color, sums in metrics.game_metrics(records, config["mate_score"]).items():
+        state.merge_stats(global_stats, {w_raw if color == chess.WHITE else b_raw: sums})
+    return True
+
+def classify_moves(game, evals, config, op_trackers):
+    """
+    Фаза 2: по оценкам движка заполняет записи MoveRecord для ходов учеников.
+    op_trackers - {цвет ученика: статистика дебюта}. Партия не меняется.
+    """
+    board = game.board()
+    start_ply = board.ply()
+    result = game.headers.get('Result', '*')
     tech_advantage_flag = {chess.WHITE: False, chess.BLACK: False}
+    records = []
+    gid = game_id(game)
 
-    while node.variations:
-        next_node = node.variation(0)
-        move = next_node.move
+    for move in game.mainline_moves():
         turn = board.turn
-        student_name = w_raw if turn == chess.WHITE else b_raw
-        
+        if turn not in op_trackers:
+            board.push(move); continue
+
         # Сбор данных дебюта
-        if turn in op_trackers:
-            st = op_trackers[turn]
-            p = board.piece_at(move.from_square)
-            if p and p.piece_type == chess.PAWN and move.to_square in st["target_center"]: st["center_control"] = True
-            if board.is_castling(move): st["has_castled"] = True
-            st["moved_pieces"].add(move.from_square)
-        
-        should_analyze = (turn == chess.WHITE and an_white) or (turn == chess.BLACK and an_black)
-
-        if not should_analyze:
-            if turn in op_trackers and not op_trackers[turn]["checked"] and board.fullmove_number == 15:
-                rep = opening.check_opening_principles(op_trackers[turn], turn)
-                if rep:
-                    msg = f"; {rep}" if next_node.comment else rep
-                    next_node.comment = (next_node.comment + msg) if next_node.comment else msg
-                    for k in ["не захватил центр", "не сделал рокировку", "не развил фигуры"]:
-                        if k in rep: global_stats[student_name]["op_errors"][k] += 1
-                op_trackers[turn]["checked"] = True
-            
-            board.push(move); node = next_node; continue
+        st = op_trackers[turn]
+        p = board.piece_at(move.from_square)
+        if p and p.piece_type == chess.PAWN and move.to_square in st["target_center"]: st["center_control"] = True
+        if board.is_castling(move): st["has_castled"] = True
+        st["moved_pieces"].add(move.from_square)
+
+        rec = move_records.MoveRecord(board.ply() - start_ply, turn, metrics.game_phase(board))
 
         # --- АНАЛИЗ ---
+        t0 = time.perf_counter()
         try:
-            limit = chess.engine.Limit(depth=config["engine_depth"])
-            info = engine.analyse(board, limit, multipv=1)
-            if isinstance(info, list): info = info[0]
-            if "pv" not in info:
-                board.push(move); node = next_node; continue
+            ev = evals[rec.ply]
+            if "error" in ev: raise ev["error"]
+            if not classify_position(board, move, ev, config, rec):
+                board.push(move); continue
+        except Exception as e:
+            logging.error(f"Move error: {e}")
+        slowlog.classify(gid, rec.ply, board, move, time.perf_counter() - t0)
 
-            best_move = info["pv"][0]
+        # === ТЕХНИКА ===
+        if rec.score is not None and not tech_advantage_flag[turn]:
+            if middlegame.check_technical_conversion(rec.score, 1000, result, turn, (turn == chess.WHITE)):
+                tech_advantage_flag[turn] = True
+                rec.tech = True
+
+        # Дебют
+        check_opening(rec, op_trackers[turn], turn, board)
+        if rec.best is not None or rec.opening: records.append(rec)
+        board.push(move)
+    return records
+
+def classify_position(board, move, ev, config, rec):
+    """
+    Заполняет запись rec по оценкам движка ev (см. evaluate_position) для хода move.
+    Возвращает False, если движок не дал лучшего хода.
+    """
+    info = ev["info"]
+    if "pv" not in info: return False
+
+    best_move = rec.best = info["pv"][0]
+    # Объект PovScore (относительная оценка)
+    best_score_obj = rec.score = info["score"]
+    played = ev["played"]
+    rec.played = best_score_obj if played is None else played.get("score")
+    turn = board.turn
+
+    # === 1. СТРАТЕГИЯ ===
+    rec.strategy = registry.tags_to_mask(registry.get_strategy_tags(board, move, best_move))
+
+    # Если ход лучший
+    if move == best_move: return True
+
+    # === 2. ТАКТИКА И МАТ ===
+    # --- УПУЩЕННЫЙ МАТ ---
+    if best_score_obj.is_mate():
+        # ИСПРАВЛЕНИЕ: берем .pov(turn).mate() вместо прямого .mate()
+        mate_in = best_score_obj.pov(turn).mate()
+        
+        # Ищем мат только если он для нас положительный (мы выигрываем)
+        if mate_in > 0 and mate_in <= config["mate_depth_trigger"]:
+            u_score_obj = ev["played"]["score"]
             
-            # Объект PovScore (относительная оценка)
-            best_score_obj = info["score"] 
-
-            # === 1. СТРАТЕГИЯ ===
-            strat_tags = registry.get_strategy_tags(board, move, best_move)
-            if strat_tags:
-                for t in strat_tags:
-                    global_stats[student_name]["strat_stats"][t] += 1
-                strat_comment = ", ".join(strat_tags)
-                if next_node.comment:
-                    next_node.comment += f"; {strat_comment}"
-                else:
-                    next_node.comment = strat_comment
-
-            # === 2. ТЕХНИКА ===
-            if middlegame.check_technical_conversion(best_score_obj, 1000, result, turn, (turn == chess.WHITE)):
-                if not tech_advantage_flag[turn]:
-                    tech_advantage_flag[turn] = True
-                    global_stats[student_name]["tech_errors"] += 1
-                    msg = "; [Не реализовал перевес +10]" if next_node.comment else "[Не реализовал перевес +10]"
-                    next_node.comment = (next_node.comment + msg) if next_node.comment else msg
-
-            # Если ход лучший
-            if move == best_move:
-                # Дебют
-                if turn in op_trackers and not op_trackers[turn]["checked"] and board.fullmove_number == 15:
-                    rep = opening.check_opening_principles(op_trackers[turn], turn)
-                    if rep:
-                        msg = f"; {rep}" if next_node.comment else rep
-                        next_node.comment = (next_node.comment + msg) if next_node.comment else msg
-                        for k in ["не захватил центр", "не сделал рокировку", "не развил фигуры"]:
-                            if k in rep: global_stats[student_name]["op_errors"][k] += 1
-                    op_trackers[turn]["checked"] = True
-                
-                board.push(move); node = next_node; continue
-
-            # === 3. ТАКТИКА И МАТ ===
-            mate_found = False
+            # ИСПРАВЛЕНИЕ: здесь тоже .pov(turn).mate()
+            u_mate = u_score_obj.pov(turn).mate() if u_score_obj.is_mate() else 0
             
-            # --- УПУЩЕННЫЙ МАТ ---
-            if best_score_obj.is_mate():
-                # ИСПРАВЛЕНИЕ: берем .pov(turn).mate() вместо прямого .mate()
-                mate_in = best_score_obj.pov(turn).mate()
-                
-                # Ищем мат только если он для нас положительный (мы выигрываем)
-                if mate_in > 0 and mate_in <= config["mate_depth_trigger"]:
-                    board.push(move); board.pop()
-                    u_info = engine.analyse(board, limit, root_moves=[move])
-                    u_score_obj = u_info["score"]
-                    
-                    # ИСПРАВЛЕНИЕ: здесь тоже .pov(turn).mate()
-                    u_mate = u_score_obj.pov(turn).mate() if u_score_obj.is_mate() else 0
-                    
-                    if not u_score_obj.is_mate() or (u_mate > 0 and u_mate > mate_in):
-                        lbl = f"Не нашел мат в {mate_in}"
-                        global_stats[student_name]["tac_errors"][lbl] += 1
-                        
-                        next_node.nags.add(chess.pgn.NAG_BLUNDER)
-                        
-                        var_node = node.add_variation(best_move)
-                        if "pv" in info and len(info["pv"]) > 1:
-                            current_var = var_node
-                            for pv_move in info["pv"][1:]:
-                                current_var = current_var.add_main_variation(pv_move)
-                        
-                        var_node.comment = utils.get_mate_comment(mate_in)
-                        mate_found = True
-
-            # --- ОБЫЧНЫЕ ОШИБКИ ---
-            if not mate_found:
-                board.push(move); board.pop()
-                u_info = engine.analyse(board, limit, root_moves=[move])
-                u_score_obj = u_info["score"]
-                
-                # Передаем объекты PovScore в utils, там они корректно обрабатываются
-                diff = utils.calculate_score_difference(best_score_obj, u_score_obj, turn, config["mate_score"])
-                nag = utils.get_error_type(diff, config)
-                
-                if nag and diff >= config["error_threshold"]:
-                    tags = registry.get_tactical_tags(board, move, best_move)
-                    
-                    if tags:
-                        for t in tags: global_stats[student_name]["tac_errors"][t] += 1
-                        logging.info(f"   [x] Ошибка (Ход {board.fullmove_number}): {', '.join(tags)}")
-                    else:
-                        global_stats[student_name]["tac_errors"]["Прочие ошибки"] += 1
-                        logging.info(f"   [x] Ошибка (Ход {board.fullmove_number}): Loss {diff}")
-                        
-                    next_node.nags.add(nag)
-                    
-                    var_node = node.add_variation(best_move)
-                    if "pv" in info and len(info["pv"]) > 1:
-                        current_var = var_node
-                        for i, pv_move in enumerate(info["pv"][1:]):
-                            if i > 5: break 
-                            current_var = current_var.add_main_variation(pv_move)
-                    
-                    all_comments = tags 
-                    if all_comments: var_node.comment = ", ".join(all_comments)
-
-        except Exception as e:
-            logging.error(f"Move error: {e}")
+            if not u_score_obj.is_mate() or (u_mate > 0 and u_mate > mate_in):
+                rec.mate_in = mate_in
+                rec.nag = chess.pgn.NAG_BLUNDER
+                rec.pv = tuple(info["pv"])
+                return True
+
+    # --- ОБЫЧНЫЕ ОШИБКИ ---
+    u_score_obj = ev["played"]["score"]
+    
+    # Передаем объекты PovScore в utils, там они корректно обрабатываются
+    diff = utils.calculate_score_difference(best_score_obj, u_score_obj, turn, config["mate_score"])
+    nag = utils.get_error_type(diff, config)
+    rec.loss = diff
+    
+    if nag and diff >= config["error_threshold"]:
+        rec.tactics = registry.tags_to_mask(registry.get_tactical_tags(board, move, best_move))
+        rec.nag = nag
+        rec.pv = tuple(info["pv"][:7])
+    return True
 
-        # Дебют (повтор логики)
-        if turn in op_trackers and not op_trackers[turn]["checked"] and board.fullmove_number == 15:
-            rep = opening.check_opening_principles(op_trackers[turn], turn)
-            if rep:
-                msg = f"; {rep}" if next_node.comment else rep
-                next_node.comment = (next_node.comment + msg) if next_node.comment else msg
-                for k in ["не захватил центр", "не сделал рокировку", "не развил фигуры"]:
-                    if k in rep: global_stats[student_name]["op_errors"][k] += 1
-            op_trackers[turn]["checked"] = True
+def check_opening(rec, tracker, turn, board):
+    """Итоги дебюта подводятся один раз, на 15-м ходу."""
+    if not tracker["checked"] and board.fullmove_number == 15:
+        rec.opening = opening.check_opening_principles(tracker, turn)
+        tracker["checked"] = True
+
+def render_game(game, records, global_stats, move_log=None):
+    """
+    Фаза 3: переносит записи в партию (комментарии, NAG, варианты) и в global_stats.
+    Если передан список move_log, в него складываются структурированные итоги по ходам.
+    """
+    w_raw = game.headers.get('White', '?')
+    b_raw = game.headers.get('Black', '?')
+    by_ply = {rec.ply: rec for rec in records}
+    board = game.board()
+    node = game
+    ply = 0
 
+    while node.variations:
+        next_node = node.variation(0)
+        move = next_node.move
+        rec = by_ply.get(ply)
+        if rec is not None:
+            render_move(rec, board, node, next_node, w_raw if board.turn == chess.WHITE else b_raw,
+                        global_stats, move_log)
         board.push(move)
         node = next_node
-    return True
+        ply += 1
+
+def render_move(rec, board, node, next_node, student_name, global_stats, move_log):
+    stats = global_stats[student_name]
+    comments = []
+
+    if rec.best is not None:
+        strategy = registry.mask_to_tags(rec.strategy)
+        tactics = registry.mask_to_tags(rec.tactics)
+        if rec.mate_in: tactics = [rec.mate_label()]
+        if move_log is not None:
+            move_log.append({
+                "ply": board.ply() + 1, "move": board.san(next_node.move), "player": student_name,
+                "color": "white" if board.turn == chess.WHITE else "black",
+                "best_move": board.san(rec.best), "score": str(rec.score.white()),
+                "nag": rec.nag or None, "loss": rec.loss, "tactics": tactics, "strategy": strategy
+            })
+
+        for t in strategy: stats["strat_stats"][t] += 1
+        if strategy: comments.append(", ".join(strategy))
+
+        if rec.tech:
+            stats["tech_errors"] += 1
+            comments.append(move_records.TECH_COMMENT)
+
+        if rec.mate_in:
+            stats["tac_errors"][tactics[0]] += 1
+            var_comment = utils.get_mate_comment(rec.mate_in)
+        elif rec.nag:
+            if tactics:
+                for t in tactics: stats["tac_errors"][t] += 1
+                logging.info(f"   [x] Ошибка (Ход {board.fullmove_number}): {', '.join(tactics)}")
+            else:
+                stats["tac_errors"]["Прочие ошибки"] += 1
+                logging.info(f"   [x] Ошибка (Ход {board.fullmove_number}): Loss {rec.loss}")
+            var_comment = ", ".join(tactics)
+
+        if rec.nag:
+            next_node.nags.add(rec.nag)
+            var_node = node.add_variation(rec.pv[0])
+            current_var = var_node
+            for pv_move in rec.pv[1:]:
+                current_var = current_var.add_main_variation(pv_move)
+            if var_comment: var_node.comment = var_comment
+
+    if rec.opening:
+        comments.append(rec.opening)
+        for k in ["не захватил центр", "не сделал рокировку", "не развил фигуры"]:
+            if k in rec.opening: stats["op_errors"][k] += 1
+
+    if comments:
+        text = "; ".join(comments)
+        next_node.comment = f"{next_node.comment}; {text}" if next_node.comment else text
+
+def make_tracking_info(students_data):
+    sorted_students = sorted(students_data.keys())
+    return {
+        'student_indices': {name: i+1 for i, name in enumerate(sorted_students)},
+        'student_progress': Counter(),
+        'total_students': len(students_data),
+        'global_game_counter': 0
+    }
 
-def main():
-    config = load_config()
+def iter_file_games(path, engine, config, students_data, tracking_info, output_folder, file_stats, stored=None):
+    """
+    Анализирует один PGN файл и пишет {имя}_analyze.pgn, партия за партией.
+    После каждой проанализированной партии отдает множество ее учеников (нормализованные имена),
+    чтобы планировщик мог чередовать файлы. Статистика копится в file_stats.
+    Партии, не прошедшие фильтр по заголовкам (filters.py), отбрасываются до разбора ходов.
+    Оценки движка сохраняются в {имя}_evals.jsonl.gz (store_evals). Если передан stored
+    (evalstore.EvalReader), оценки берутся из него, а движок не нужен (engine=None).
+    Если генератор закрыть досрочно, недописанный файл результата удаляется.
+    """
+    filename = os.path.basename(path)
+    base = pgn_io.pgn_base_name(path)
+    out_path = os.path.join(output_folder, f"{base}_analyze.pgn")
+    keep_evals = stored is None and config.get("store_evals", True)
+    skipped = filtered = 0
     
-    input_folder = config.get("input_folder", "pgn")
-    output_folder = config.get("output_folder", "pgn_analyzed")
-    
-    if not os.path.exists(input_folder):
-        os.makedirs(input_folder, exist_ok=True)
-        print(f"Создана папка для входных файлов: {input_folder}")
-        
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder, exist_ok=True)
-        
-    setup_logging(output_folder)
+    logging.info(f"=== Файл: {filename} ===")
     
+    try:
+        # Запись идет в фоне во временный файл и переименовывается только в конце
+        with pgn_io.AsyncWriter(out_path, config.get("output_compression"),
+                                config.get("output_queue_size", 64)) as out, \
+             (evalstore.EvalWriter(output_folder, path, config) if keep_evals else nullcontext()) as store:
+            for i, g in enumerate(read_file_games(path, config)):
+                if g is None:
+                    filtered += 1; continue
+                names = (normalize_name(g.headers.get('White', '?')), normalize_name(g.headers.get('Black', '?')))
+                students = {n for n in names if n in students_data}
+                if not students: continue
+                evals = None
+                if stored is not None:
+                    evals = stored.get(i, g)
+                    colors = {color for color, n in zip((chess.WHITE, chess.BLACK), names) if n in students}
+                    if evals is None or not evalstore.covers(evals, g, colors):
+                        skipped += 1; continue
+                sink = [] if keep_evals else None
+                if process_game(g, engine, config, students_data, file_stats, tracking_info,
+                                evals=evals, eval_sink=sink):
+                    out.write_game(g)
+                    if keep_evals: store.write(i, sink[0])
+                    yield students
+        if filtered:
+            logging.info(f"{filename}: отброшено фильтром по заголовкам: {filtered} партий")
+        if skipped:
+            logging.warning(f"{filename}: партий учеников без сохраненных оценок: {skipped} (пропущены)")
+    except RuntimeError as e:
+        logging.error(f"Файл {filename} пропущен: {e}")
+
+def analyze_file(path, engine, config, students_data, tracking_info, output_folder):
+    """
+    Анализирует один PGN файл целиком (см. iter_file_games).
+    Возвращает статистику учеников по этому файлу.
+    """
+    file_stats = {}
+    for _ in iter_file_games(path, engine, config, students_data, tracking_info, output_folder, file_stats):
+        pass
+    return file_stats
+
+def record_file(app_state, path, config, students_data, file_stats, player_counts=None, signature=None):
+    """Запоминает результат анализа файла в сохраняемом состоянии."""
+    if player_counts is None:
+        player_counts = count_players(path, config, get_target_filter(config))
+    mtime, size = signature or state.file_signature(path)
+    app_state["files"][path] = {
+        "mtime": mtime, "size": size,
+        "players": dict(player_counts),
+        "students": sorted(n for n in player_counts if n in students_data),
+        "stats": file_stats
+    }
+
+# Команда -> старый флаг с тем же действием (флаги оставлены для совместимости)
+LEGACY_FLAGS = {"watch": "watch", "serve": "serve", "calibrate": "bench", "positions": "positions"}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный анализ шахматных партий (PGN)")
+    parser.add_argument("--config", default="config.json", help="Путь к config.json")
+    parser.add_argument("--profile", action="store_true",
+                        help="Выполнить команду под профайлером (profile_mode) и сохранить стеки в папку результатов")
+    parser.add_argument("--watch", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--positions", nargs="+", metavar="FILE", help=argparse.SUPPRESS)
+    parser.add_argument("--calibrate", action="store_true", help=argparse.SUPPRESS)
+
+    # --config можно указать и после команды: python chess_analyze.py report --config my.json
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", default=argparse.SUPPRESS, help="Путь к config.json")
+    common.add_argument("--profile", action="store_true", default=argparse.SUPPRESS,
+                        help="Выполнить команду под профайлером")
+    commands = parser.add_subparsers(dest="command", metavar="КОМАНДА")
+    commands.add_parser("analyse", parents=[common], help="Проанализировать партии из input_folder (по умолчанию)")
+    commands.add_parser("students", parents=[common], help="Показать найденных учеников (без движка)")
+    commands.add_parser("report", parents=[common],
+                        help="Пересобрать Report_*.txt из analysis_state.json (без движка)")
+    commands.add_parser("reclassify", parents=[common],
+                        help="Пересобрать *_analyze.pgn и отчеты по сохраненным оценкам движка (без движка)")
+    commands.add_parser("bench", parents=[common],
+                        help="Подобрать engine_workers/threads/hash и записать config.suggested.json")
+    commands.add_parser("watch", parents=[common],
+                        help="Следить за input_folder и анализировать новые файлы по мере появления")
+    commands.add_parser("serve", parents=[common], help="Запустить локальный HTTP-сервис анализа (см. service.py)")
+    positions_cmd = commands.add_parser("positions", parents=[common],
+                                        help="Проанализировать позиции из EPD/CSV (FEN + сыгранный ход)")
+    positions_cmd.add_argument("files", nargs="+", metavar="FILE")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        for flag, command in LEGACY_FLAGS.items():
+            if getattr(args, flag):
+                args.command = command
+                if command == "positions": args.files = args.positions
+                break
+        else:
+            args.command = "analyse"
+    return args
+
+def show_students(config, input_folder, output_folder):
+    """Список учеников по заголовкам (неизмененные файлы берутся из headers_cache.json)."""
+    pgn_files = get_pgn_files(input_folder)
+    if not pgn_files:
+        logging.warning(f"Файлы PGN не найдены в папке '{input_folder}'."); return
+    header_cache = state.load_headers_cache(output_folder)
+    find_all_students(pgn_files, config, header_cache=header_cache)
+    state.save_headers_cache(header_cache, output_folder)
+
+def rebuild_reports(output_folder):
+    """Отчеты из сохраненных результатов (analysis_state.json), без движка и без чтения партий."""
+    app_state = state.load_state(output_folder)
+    if not app_state["files"]:
+        logging.warning(f"В {output_folder} нет сохраненных результатов ({state.STATE_FILE}). Сначала запустите анализ.")
+        return
+    generate_reports(state.aggregate_stats(app_state), output_folder, sampling=app_state.get("sampling"))
+    logging.info(f"Отчеты пересобраны по {len(app_state['files'])} файлам.")
+
+def run_analysis(config, input_folder, output_folder):
     pgn_files = get_pgn_files(input_folder)
     
     if not pgn_files:
@@ -356,51 +793,150 @@ def main():
         print(f"\n[!] Папка '{input_folder}' пуста. Добавьте туда файлы .pgn и запустите снова.")
         return
     
-    students_data = find_all_students(pgn_files, config)
+    file_counts = {}
+    header_cache = state.load_headers_cache(output_folder)
+    students_data = find_all_students(pgn_files, config, file_counts, header_cache)
+    state.save_headers_cache(header_cache, output_folder)
     if not students_data: return
     
-    sorted_students = sorted(students_data.keys())
-    student_indices = {name: i+1 for i, name in enumerate(sorted_students)}
-    student_progress = {name: 0 for name in students_data}
-    
-    tracking_info = {
-        'student_indices': student_indices,
-        'student_progress': student_progress,
-        'total_students': len(students_data),
-        'global_game_counter': 0
-    }
+    tracking_info = make_tracking_info(students_data)
     
     try:
         logging.info("Запуск движка...")
-        engine = chess.engine.SimpleEngine.popen_uci(config["stockfish_path"])
-        engine.configure({
-            "Threads": config.get("engine_threads", 1),
-            "Hash": config.get("engine_hash", 16)
-        })
+        pool = engine_pool.EnginePool(config)
     except Exception as e:
         logging.critical(f"Engine fail: {e}"); return
         
     global_stats = {}
+    app_state = {"files": {}, "game_filter": filters.filter_key(config)}
+    
+    if config.get("sampling"):
+        import sampling
+        all_file_stats, app_state["sampling"] = sampling.run(pgn_files, pool.engines, config, students_data,
+                                                             tracking_info, output_folder)
+    elif config.get("schedule", "fair") == "fair":
+        import scheduler
+        all_file_stats = scheduler.run(pgn_files, file_counts, pool.engines, config, students_data,
+                                       tracking_info, output_folder)
+    else:
+        all_file_stats = {f: analyze_file(f, pool.engines, config, students_data, tracking_info, output_folder)
+                          for f in pgn_files}
     
     for f in pgn_files:
-        filename = os.path.basename(f)
-        base = os.path.splitext(filename)[0]
-        out_path = os.path.join(output_folder, f"{base}_analyze.pgn")
-        
-        logging.info(f"=== Файл: {filename} ===")
-        
-        with open(f, "r", encoding="utf-8", errors="replace") as pin, open(out_path, "w", encoding="utf-8") as pout:
-            exp = chess.pgn.FileExporter(pout)
-            while True:
-                g = chess.pgn.read_game(pin)
-                if g is None: break
-                if process_game(g, engine, config, students_data, global_stats, tracking_info):
-                    g.accept(exp)
+        file_stats = all_file_stats.get(f, {})
+        state.merge_stats(global_stats, file_stats)
+        record_file(app_state, f, config, students_data, file_stats, file_counts.get(f))
                     
-    engine.quit()
-    generate_reports(global_stats, output_folder)
+    pool.log_stats()
+    registry.log_check_stats()
+    registry.log_cache_stats()
+    registry.save_cache()
+    pool.close()
+    state.save_state(app_state, output_folder)
+    pgn_io.close_pool()
+    generate_reports(global_stats, output_folder, sampling=app_state.get("sampling"))
     logging.info(f"ВСЕ ГОТОВО. Результаты в папке: {output_folder}")
     print(f"\nАнализ завершен. Результаты в папке: {output_folder}")
 
+def run_reclassify(config, input_folder, output_folder):
+    """
+    Повторная классификация по сохраненным оценкам (evalstore): пороги, error_threshold,
+    mate_depth_trigger и проверки registry применяются заново, *_analyze.pgn и отчеты
+    пересобираются. Движок не запускается. Файлы без подходящих оценок остаются как были.
+    """
+    pgn_files = get_pgn_files(input_folder)
+    if not pgn_files:
+        logging.warning(f"Файлы PGN не найдены в папке '{input_folder}'."); return
+    
+    file_counts = {}
+    header_cache = state.load_headers_cache(output_folder)
+    students_data = find_all_students(pgn_files, config, file_counts, header_cache)
+    state.save_headers_cache(header_cache, output_folder)
+    if not students_data: return
+    
+    tracking_info = make_tracking_info(students_data)
+    app_state = state.load_state(output_folder)
+    app_state["files"] = {f: e for f, e in app_state["files"].items() if f in pgn_files}
+    app_state.pop("sampling", None)  # Интервалы выборки относились к старой классификации
+    app_state["game_filter"] = filters.filter_key(config)
+    
+    for f in pgn_files:
+        stored = evalstore.open_store(output_folder, f, config)
+        if stored is None: continue
+        file_stats = {}
+        with stored:
+            for _ in iter_file_games(f, None, config, students_data, tracking_info, output_folder, file_stats, stored):
+                pass
+        record_file(app_state, f, config, students_data, file_stats, file_counts.get(f))
+    
+    registry.log_check_stats()
+    registry.log_cache_stats()
+    registry.save_cache()
+    state.save_state(app_state, output_folder)
+    pgn_io.close_pool()
+    generate_reports(state.aggregate_stats(app_state), output_folder)
+    logging.info(f"Повторная классификация завершена. Результаты в папке: {output_folder}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config(args.config)
+    
+    input_folder = config.get("input_folder", "pgn")
+    output_folder = config.get("output_folder", "pgn_analyzed")
+    
+    if not os.path.exists(input_folder):
+        os.makedirs(input_folder, exist_ok=True)
+        print(f"Создана папка для входных файлов: {input_folder}")
+        
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder, exist_ok=True)
+        
+    setup_logging(output_folder)
+    slowlog.setup(config, output_folder)
+    
+    if args.profile:
+        import profiler
+        profiler.run(lambda: run_command(args, config, input_folder, output_folder), config, output_folder)
+    else:
+        run_command(args, config, input_folder, output_folder)
+
+def run_command(args, config, input_folder, output_folder):
+    # Команды без движка: модули анализа так и не загружаются
+    if args.command == "students":
+        show_students(config, input_folder, output_folder)
+        return
+    
+    if args.command == "report":
+        rebuild_reports(output_folder)
+        return
+    
+    registry.setup_cache(config, output_folder)
+    
+    if args.command == "reclassify":
+        run_reclassify(config, input_folder, output_folder)
+        return
+    
+    if args.command == "serve":
+        import service
+        service.serve(config)
+        return
+    
+    if args.command == "bench":
+        import calibrate
+        calibrate.run(config, args.config, input_folder)
+        return
+    
+    if args.command == "positions":
+        import positions
+        positions.run(config, args.files, output_folder)
+        return
+    
+    if args.command == "watch":
+        import watcher
+        watcher.watch(config, input_folder, output_folder)
+        return
+    
+    run_analysis(config, input_folder, output_folder)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,214 @@
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+import chess.engine
+
+import affinity
+
+"""
+ENGINE_POOL.PY
+Запуск и настройка движков Stockfish.
+EngineSupervisor следит за движком: таймаут на каждый вызов, перезапуск упавшего/зависшего
+процесса и повтор прерванного анализа.
+EnginePool держит несколько "прогретых" движков, чтобы не платить за запуск на каждый файл/партию.
+С cpu_affinity: true каждый движок привязывается к своим физическим ядрам (affinity.py).
+"""
+
+# Ошибки, после которых движок считается мертвым и перезапускается
+ENGINE_FAILURES = (chess.engine.EngineTerminatedError, OSError, TimeoutError)
+
+class EngineFailure(RuntimeError):
+    """Движок не смог проанализировать позицию даже после перезапусков."""
+
+class EngineCancelled(RuntimeError):
+    """Поиск прерван через cancel(): результат больше никому не нужен."""
+
+def launch_engine(config, cpus=None):
+    """
+    Запускает и настраивает один движок по параметрам из конфига.
+    engine_client: "python-chess" (по умолчанию) или "lean" - облегченный клиент uci_client.
+    cpus - логические CPU, к которым привязываются все потоки движка (affinity.setup).
+    """
+    if config.get("engine_client", "python-chess") == "lean":
+        import uci_client
+        engine = uci_client.LeanEngine(config["stockfish_path"], config.get("engine_pipeline", 2))
+    else:
+        engine = chess.engine.SimpleEngine.popen_uci(config["stockfish_path"])
+    engine.configure({
+        "Threads": config.get("engine_threads", 1),
+        "Hash": config.get("engine_hash", 16)
+    })
+    # После configure: потоки поиска (Threads) уже созданы
+    if cpus: affinity.pin(engine_pid(engine), cpus, children=True)
+    return engine
+
+def engine_pid(engine):
+    if hasattr(engine, "process"): return engine.process.pid  # uci_client.LeanEngine
+    return engine.transport.get_pid()
+
+class EngineSupervisor:
+    """
+    Обертка над движком с тем же методом analyse().
+    Если вызов длится дольше engine_timeout секунд, процесс убивается (watchdog).
+    После падения или зависания движок перезапускается с теми же Threads/Hash,
+    а позиция анализируется заново (до engine_retries раз).
+    """
+
+    def __init__(self, config, name="engine", cpus=None):
+        self.config = config
+        self.name = name
+        self.cpus = cpus
+        self.timeout = config.get("engine_timeout", 120)
+        self.retries = config.get("engine_retries", 2)
+        self.calls = 0
+        self.restarts = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.cancels = 0
+        self.cancelled = False
+        self._busy = False
+        self._timed_out = False
+        self.engine = launch_engine(config, cpus)
+
+    def _kill(self):
+        self._timed_out = True
+        self.engine.close()
+
+    def cancel(self):
+        """
+        Прерывает текущий поиск (например, запрос сервиса не дождался ответа): процесс движка
+        убивается и перезапускается. До clear_cancel() все вызовы сразу завершаются EngineCancelled.
+        """
+        self.cancelled = True
+        self.cancels += 1
+        if self._busy: self.engine.close()
+
+    def clear_cancel(self):
+        self.cancelled = False
+
+    def restart(self):
+        try: self.engine.close()
+        except Exception: pass
+        self.engine = launch_engine(self.config, self.cpus)
+        self.restarts += 1
+
+    @property
+    def pipelined(self):
+        """True, если клиент сам отправляет пачку поисков конвейером (uci_client)."""
+        return hasattr(self.engine, "analyse_many")
+
+    def analyse(self, board, limit, **kwargs):
+        return self._guarded(lambda: self.engine.analyse(board, limit, **kwargs), board, self.timeout)
+
+    def analyse_many(self, requests):
+        """
+        Несколько независимых поисков [(board, limit, root_moves)] одной пачкой.
+        Облегченный клиент отправляет их движку конвейером, python-chess - по одному.
+        """
+        if not requests: return []
+        if not hasattr(self.engine, "analyse_many"):
+            return [self.analyse(board, limit, root_moves=root_moves) for board, limit, root_moves in requests]
+        timeout = self.timeout * len(requests) if self.timeout else None
+        return self._guarded(lambda: self.engine.analyse_many(requests), requests[0][0], timeout)
+
+    def _guarded(self, call, board, timeout):
+        """Выполняет call под watchdog'ом; при падении/зависании перезапускает движок и повторяет."""
+        last_error = None
+        for attempt in range(self.retries + 1):
+            self._busy = True
+            if self.cancelled:
+                self._busy = False
+                raise EngineCancelled("Поиск отменен")
+            self.calls += 1
+            self._timed_out = False
+            watchdog = threading.Timer(timeout, self._kill) if timeout else None
+            if watchdog:
+                watchdog.daemon = True
+                watchdog.start()
+            try:
+                return call()
+            except ENGINE_FAILURES as e:
+                last_error = e
+            finally:
+                self._busy = False
+                if watchdog: watchdog.cancel()
+
+            if self.cancelled:
+                # Движок убит через cancel(): поднимаем новый, но позицию не повторяем
+                self.restart()
+                raise EngineCancelled("Поиск отменен")
+
+            if self._timed_out:
+                self.timeouts += 1
+                logging.warning(f"[{self.name}] Таймаут {timeout}с на позиции {board.fen()}, перезапуск")
+            else:
+                self.crashes += 1
+                logging.warning(f"[{self.name}] Движок упал ({last_error!r}), перезапуск")
+            try:
+                self.restart()
+            except Exception as e:
+                last_error = e
+                logging.error(f"[{self.name}] Не удалось перезапустить движок: {e}")
+        raise EngineFailure(f"Позиция {board.fen()} не проанализирована: {last_error!r}")
+
+    def stats(self):
+        return {"calls": self.calls, "restarts": self.restarts,
+                "timeouts": self.timeouts, "crashes": self.crashes, "cancels": self.cancels}
+
+    def quit(self):
+        try: self.engine.quit()
+        except Exception: self.engine.close()
+
+class EnginePool:
+    """
+    Пул движков. Движок берется через acquire() и возвращается автоматически:
+
+        with pool.acquire() as engine:
+            engine.analyse(...)
+    """
+
+    def __init__(self, config, size=None):
+        self.size = size or config.get("engine_workers", 1)
+        self.engines = []
+        self._idle = queue.Queue()
+        placement = affinity.setup(config, self.size)
+        try:
+            for i in range(self.size):
+                engine = EngineSupervisor(config, name=f"engine-{i+1}",
+                                          cpus=placement[i] if placement else None)
+                self.engines.append(engine)
+                self._idle.put(engine)
+        except Exception:
+            self.close()
+            raise
+        logging.info(f"Запущено движков: {self.size}")
+
+    def __len__(self):
+        return self.size
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        engine = self._idle.get(timeout=timeout)
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def stats(self):
+        """Суммарные счетчики вызовов и перезапусков по всем движкам."""
+        total = {}
+        for engine in self.engines:
+            for k, v in engine.stats().items(): total[k] = total.get(k, 0) + v
+        return total
+
+    def log_stats(self):
+        st = self.stats()
+        logging.info(f"Движки: вызовов {st.get('calls', 0)}, перезапусков {st.get('restarts', 0)} "
+                     f"(таймаутов {st.get('timeouts', 0)}, падений {st.get('crashes', 0)}, отмен {st.get('cancels', 0)})")
+
+    def close(self):
+        for engine in self.engines:
+            try: engine.quit()
+            except Exception: pass
+        self.engines = []
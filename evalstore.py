@@ -0,0 +1,165 @@
+import os
+import json
+import logging
+import chess
+from chess.engine import PovScore, Cp, Mate, MateGiven
+
+import pgn_io
+import state
+
+"""
+EVALSTORE.PY
+Сохраненные результаты движка для повторной классификации (команда reclassify).
+При анализе рядом с {имя}_analyze.pgn пишется {имя}_evals.jsonl.gz: первая строка -
+заголовок (исходный файл, его mtime/size, глубина), дальше по строке на партию:
+
+    {"i": номер партии в файле, "evals": [null | {"pv": [uci..], "score": "cp 35",
+                                                  "played": "mate -3", "depth": 20}, ...]}
+
+По полуходам основной линии: null - ход не анализировался, "played" нет - сыгран
+лучший ход, {"error": текст} - движок не смог посчитать позицию.
+Оценки хранятся с точки зрения стороны, которая ходит (как PovScore.relative).
+
+Повторная классификация читает файл оценок синхронно с PGN (партии в обоих по
+возрастанию номера), поэтому в памяти держится только одна партия.
+"""
+
+STORE_SUFFIX = "_evals.jsonl"
+STORE_VERSION = 1
+
+def store_path(output_folder, source_path):
+    """Путь к файлу оценок без расширения сжатия (.gz добавляет AsyncWriter)."""
+    return os.path.join(output_folder, pgn_io.pgn_base_name(source_path) + STORE_SUFFIX)
+
+# --- КОДИРОВАНИЕ ---
+
+def _encode_score(pov):
+    rel = pov.relative
+    return f"mate {rel.mate()}" if rel.is_mate() else f"cp {rel.score()}"
+
+def _decode_score(text, turn):
+    kind, value = text.split()
+    value = int(value)
+    if kind == "cp": return PovScore(Cp(value), turn)
+    return PovScore(Mate(value) if value else MateGiven, turn)
+
+def encode(evals):
+    rows = []
+    for ev in evals:
+        if ev is None:
+            rows.append(None); continue
+        if "error" in ev:
+            rows.append({"error": str(ev["error"])}); continue
+        info = ev["info"]
+        row = {}
+        if "pv" in info: row["pv"] = [m.uci() for m in info["pv"]]
+        if "score" in info: row["score"] = _encode_score(info["score"])
+        if "depth" in info: row["depth"] = info["depth"]
+        played = ev["played"]
+        if played is not None: row["played"] = _encode_score(played["score"]) if "score" in played else None
+        rows.append(row)
+    return rows
+
+def decode(rows, game):
+    """Список оценок в том же виде, что дает chess_analyze.collect_evals."""
+    first_turn = game.board().turn
+    evals = []
+    for ply, row in enumerate(rows):
+        if row is None:
+            evals.append(None); continue
+        if "error" in row:
+            evals.append({"error": RuntimeError(row["error"])}); continue
+        turn = first_turn if ply % 2 == 0 else not first_turn
+        info = {}
+        if "pv" in row: info["pv"] = [chess.Move.from_uci(m) for m in row["pv"]]
+        if "score" in row: info["score"] = _decode_score(row["score"], turn)
+        if "depth" in row: info["depth"] = row["depth"]
+        played = None
+        if "played" in row:
+            played = {"score": _decode_score(row["played"], turn)} if row["played"] else {}
+        evals.append({"info": info, "played": played})
+    return evals
+
+def covers(evals, game, colors):
+    """True, если оценки подходят к партии и есть для всех ходов цветов colors."""
+    first_turn = game.board().turn
+    plies = sum(1 for _ in game.mainline_moves())
+    if len(evals) != plies: return False
+    return all(ev is not None for ply, ev in enumerate(evals)
+               if (first_turn if ply % 2 == 0 else not first_turn) in colors)
+
+# --- ЗАПИСЬ И ЧТЕНИЕ ---
+
+class EvalWriter:
+    """Пишет оценки партий файла в фоне (pgn_io.AsyncWriter, .gz)."""
+
+    def __init__(self, output_folder, source_path, config):
+        mtime, size = state.file_signature(source_path)
+        self.out = pgn_io.AsyncWriter(store_path(output_folder, source_path), "gz",
+                                      config.get("output_queue_size", 64))
+        self.out.write(json.dumps({"version": STORE_VERSION, "source": os.path.basename(source_path),
+                                   "mtime": mtime, "size": size,
+                                   "engine_depth": config.get("engine_depth")}) + "\n")
+
+    def write(self, index, evals):
+        self.write_encoded(index, encode(evals))
+
+    def write_encoded(self, index, rows):
+        """Оценки, уже переведенные в строки файла (encode)."""
+        self.out.write(json.dumps({"i": index, "evals": rows}) + "\n")
+
+    def close(self, discard=False):
+        self.out.close(discard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self.out.__exit__(exc_type, exc, tb)
+
+class EvalReader:
+    """Читает оценки по возрастанию номера партии, синхронно с pgn_io.read_games."""
+
+    def __init__(self, path):
+        self.handle = pgn_io.open_text(path)
+        self.header = json.loads(self.handle.readline())
+        self._next = self._read()
+
+    def _read(self):
+        line = self.handle.readline()
+        return json.loads(line) if line.strip() else None
+
+    def get(self, index, game):
+        """Оценки партии index или None, если их нет в файле."""
+        while self._next is not None and self._next["i"] < index:
+            self._next = self._read()
+        if self._next is None or self._next["i"] != index: return None
+        return decode(self._next["evals"], game)
+
+    def close(self):
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def open_store(output_folder, source_path, config):
+    """EvalReader для файла или None (оценок нет или исходный PGN изменился после анализа)."""
+    path = store_path(output_folder, source_path) + ".gz"
+    name = os.path.basename(source_path)
+    if not os.path.exists(path):
+        logging.warning(f"{name}: нет сохраненных оценок ({os.path.basename(path)}) - файл пропущен")
+        return None
+    reader = EvalReader(path)
+    mtime, size = state.file_signature(source_path)
+    if (reader.header.get("mtime"), reader.header.get("size")) != (mtime, size):
+        logging.warning(f"{name}: файл изменился после анализа - сохраненные оценки не подходят, файл пропущен")
+        reader.close()
+        return None
+    if reader.header.get("engine_depth") != config.get("engine_depth"):
+        logging.warning(f"{name}: оценки посчитаны на глубине {reader.header.get('engine_depth')}, "
+                        f"а в конфиге {config.get('engine_depth')} - используются сохраненные")
+    return reader
@@ -0,0 +1,111 @@
+import re
+import logging
+from datetime import date, timedelta
+
+"""
+FILTERS.PY
+Фильтр партий по заголовкам (дата, контроль времени, турнир, число полуходов).
+Проверяется при чтении заголовков, до разбора ходов: отброшенные партии стоят только
+разбора заголовков (pgn_io.read_games/read_headers с game_filter).
+
+    filter_date_from / filter_date_to: "2024.01.31" - включительно, по UTCDate (иначе Date)
+    filter_last_days: 30 - только партии за последние N дней (считается от даты запуска)
+    filter_time_controls: ["rapid", "classical"] - классы контроля (или "Рапид", "Классика")
+    filter_event_regex: "^Rated" - регулярное выражение для заголовка Event (поиск, не полное совпадение)
+    filter_min_plies: 20 - минимум полуходов по PlyCount; если заголовка нет, партия
+                           проверяется после разбора ходов
+
+Фильтр применяется везде: подсчет учеников, выборка, анализ, повторная классификация.
+Партии без даты (или с неполной датой) при фильтре по дате отбрасываются.
+"""
+
+UNKNOWN = "?"
+
+# Английские названия классов контроля -> названия из отчета
+TC_ALIASES = {"bullet": "Пуля", "blitz": "Блиц", "rapid": "Рапид", "classical": "Классика", "unknown": UNKNOWN}
+
+def time_control_class(tc):
+    """Класс контроля по заголовку TimeControl ('300+3'): расчетное время на 40 ходов, как у lichess."""
+    if not tc or tc in ("-", UNKNOWN): return UNKNOWN
+    if "/" in tc: return "Классика"  # Заочные и контроль "ходов/секунд"
+    try:
+        base, _, inc = tc.partition("+")
+        total = int(base) + 40 * int(inc or 0)
+    except ValueError:
+        return UNKNOWN
+    if total < 180: return "Пуля"
+    if total < 480: return "Блиц"
+    if total < 1500: return "Рапид"
+    return "Классика"
+
+def game_date(headers):
+    """Дата партии 'ГГГГ.ММ.ДД' (UTCDate, иначе Date) или None, если она неизвестна или неполная."""
+    value = headers.get("UTCDate") or headers.get("Date") or ""
+    return value if re.fullmatch(r"\d{4}\.\d{2}\.\d{2}", value) else None
+
+class HeaderFilter:
+    """Условия фильтра из конфига. Объект передается в процессы разбора PGN (pickle)."""
+
+    def __init__(self, date_from=None, date_to=None, time_controls=None, event_regex=None, min_plies=0):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.time_controls = set(time_controls) if time_controls else None
+        self.event = re.compile(event_regex) if event_regex else None
+        self.min_plies = min_plies
+
+    def key(self):
+        """Описание фильтра для кэшей: при другом фильтре подсчеты по файлам недействительны."""
+        return {"date_from": self.date_from, "date_to": self.date_to,
+                "time_controls": sorted(self.time_controls) if self.time_controls else None,
+                "event_regex": self.event.pattern if self.event else None, "min_plies": self.min_plies}
+
+    def __call__(self, headers):
+        """Проверка по заголовкам. Партии без PlyCount проходят проверку числа ходов (см. plies_ok)."""
+        if self.date_from or self.date_to:
+            d = game_date(headers)
+            if d is None: return False
+            if self.date_from and d < self.date_from: return False
+            if self.date_to and d > self.date_to: return False
+        if self.time_controls is not None and time_control_class(headers.get("TimeControl")) not in self.time_controls:
+            return False
+        if self.event is not None and not self.event.search(headers.get("Event", "")):
+            return False
+        if self.min_plies:
+            plies = headers.get("PlyCount", "")
+            if plies.isdigit() and int(plies) < self.min_plies: return False
+        return True
+
+    def plies_ok(self, game):
+        """Проверка числа полуходов после разбора ходов (для партий без заголовка PlyCount)."""
+        if not self.min_plies or game.headers.get("PlyCount", "").isdigit(): return True
+        plies = 0
+        for _ in game.mainline_moves():
+            plies += 1
+            if plies >= self.min_plies: return True
+        return False
+
+def from_config(config):
+    """HeaderFilter по ключам filter_* или None, если фильтр не задан."""
+    # "2024-01-31" тоже принимается
+    date_from = (config.get("filter_date_from") or "").replace("-", ".") or None
+    date_to = (config.get("filter_date_to") or "").replace("-", ".") or None
+    last_days = config.get("filter_last_days", 0)
+    if last_days:
+        since = (date.today() - timedelta(days=last_days)).strftime("%Y.%m.%d")
+        date_from = max(date_from, since) if date_from else since
+
+    time_controls = []
+    for name in config.get("filter_time_controls") or []:
+        tc = TC_ALIASES.get(name.lower(), name.capitalize())
+        if tc not in TC_ALIASES.values():
+            logging.warning(f"Неизвестный класс контроля в filter_time_controls: {name}")
+        time_controls.append(tc)
+
+    event_regex = config.get("filter_event_regex") or None
+    min_plies = config.get("filter_min_plies", 0)
+    if not (date_from or date_to or time_controls or event_regex or min_plies): return None
+    return HeaderFilter(date_from, date_to, time_controls, event_regex, min_plies)
+
+def filter_key(config):
+    game_filter = from_config(config)
+    return game_filter.key() if game_filter is not None else None
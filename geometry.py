@@ -0,0 +1,131 @@
+import chess
+
+"""
+GEOMETRY.PY
+Геометрия линий на битбордах для тактических классификаторов.
+Таблицы считаются один раз при импорте; функции работают с масками занятости
+и не меняют доску (никаких remove_piece_at / set_piece_at / copy).
+"""
+
+SLIDERS = (chess.BISHOP, chess.ROOK, chess.QUEEN)
+
+# Линии через поле на пустой доске
+ORTH_LINES = [chess.BB_RANK_ATTACKS[sq][0] | chess.BB_FILE_ATTACKS[sq][0] for sq in chess.SQUARES]
+DIAG_LINES = [chess.BB_DIAG_ATTACKS[sq][0] for sq in chess.SQUARES]
+
+def _beyond(a, b):
+    line = chess.BB_RAYS[a][b]
+    if a == b or not line: return 0
+    if b > a:
+        return line & ~((chess.BB_SQUARES[b] << 1) - 1)
+    return line & (chess.BB_SQUARES[b] - 1)
+
+# BETWEEN[a][b] - поля строго между a и b (0, если не на одной линии)
+BETWEEN = [[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+# BEYOND[a][b] - поля на луче a -> b за полем b
+BEYOND = [[_beyond(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+
+# --- АТАКИ ---
+
+def slider_attacks(square, piece_type, occupied):
+    att = 0
+    if piece_type in (chess.BISHOP, chess.QUEEN):
+        att |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    if piece_type in (chess.ROOK, chess.QUEEN):
+        att |= (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] |
+                chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    return att
+
+def piece_attacks(square, piece_type, color, occupied):
+    """Поля, которые бьет фигура piece_type цвета color с поля square."""
+    if piece_type == chess.PAWN: return chess.BB_PAWN_ATTACKS[color][square]
+    if piece_type == chess.KNIGHT: return chess.BB_KNIGHT_ATTACKS[square]
+    if piece_type == chess.KING: return chess.BB_KING_ATTACKS[square]
+    return slider_attacks(square, piece_type, occupied)
+
+def xray_attacks(square, piece_type, occupied, blockers):
+    """
+    Рентген: поля, которые дальнобойная фигура бьет "сквозь" первые фигуры из blockers.
+    Прямые атаки в результат не входят.
+    """
+    att = slider_attacks(square, piece_type, occupied)
+    return att ^ slider_attacks(square, piece_type, occupied & ~(att & blockers))
+
+def first_beyond(a, b, occupied):
+    """Первое занятое поле на луче a -> b за полем b (или None)."""
+    beyond = BEYOND[a][b] & occupied
+    if not beyond: return None
+    return chess.lsb(beyond) if b > a else chess.msb(beyond)
+
+def attackers_mask(square, occupied, pieces, color):
+    """
+    Фигуры цвета color, бьющие square. pieces - словарь {тип: маска фигур этого цвета}
+    (позволяет считать для позиции "после хода", не делая его на доске).
+    """
+    queens = pieces[chess.QUEEN]
+    return ((chess.BB_PAWN_ATTACKS[not color][square] & pieces[chess.PAWN]) |
+            (chess.BB_KNIGHT_ATTACKS[square] & pieces[chess.KNIGHT]) |
+            (chess.BB_KING_ATTACKS[square] & pieces[chess.KING]) |
+            (slider_attacks(square, chess.BISHOP, occupied) & (pieces[chess.BISHOP] | queens)) |
+            (slider_attacks(square, chess.ROOK, occupied) & (pieces[chess.ROOK] | queens)))
+
+def pinned_to_king(king, occupied, own, enemy_pieces):
+    """
+    Абсолютные связки фигур own к королю на поле king.
+    enemy_pieces - {тип: маска} фигур соперника короля.
+    Возвращает {поле связанной фигуры: маска всей линии связки}.
+    """
+    pins = {}
+    orth = enemy_pieces[chess.ROOK] | enemy_pieces[chess.QUEEN]
+    diag = enemy_pieces[chess.BISHOP] | enemy_pieces[chess.QUEEN]
+    snipers = ((xray_attacks(king, chess.ROOK, occupied, own) & orth) |
+               (xray_attacks(king, chess.BISHOP, occupied, own) & diag))
+    for sniper in chess.scan_forward(snipers):
+        pinned = BETWEEN[king][sniper] & own
+        if pinned:
+            pins[chess.lsb(pinned)] = chess.BB_RAYS[king][sniper]
+    return pins
+
+# --- ПОЗИЦИЯ ПОСЛЕ ХОДА (только маски) ---
+
+class AfterMove:
+    """
+    Маски фигур после хода move без изменения доски.
+    mine/theirs - занятость сторон; my_pieces/their_pieces - {тип: маска}.
+    """
+    __slots__ = ("us", "mine", "theirs", "occupied", "my_pieces", "their_pieces", "moved_type")
+
+    def __init__(self, board, move):
+        us = board.turn
+        self.us = us
+        if board.is_castling(move):
+            # Рокировка двигает две фигуры - проще сделать ход на копии
+            after = board.copy(stack=False)
+            after.push(move)
+            src = after
+            self.moved_type = after.piece_type_at(move.to_square)
+        else:
+            src = board
+            self.moved_type = move.promotion or board.piece_type_at(move.from_square)
+        self.my_pieces = {pt: src.pieces_mask(pt, us) for pt in chess.PIECE_TYPES}
+        self.their_pieces = {pt: src.pieces_mask(pt, not us) for pt in chess.PIECE_TYPES}
+
+        if src is board:
+            frm = chess.BB_SQUARES[move.from_square]
+            to = chess.BB_SQUARES[move.to_square]
+            captured = to
+            if board.is_en_passant(move):
+                captured = chess.BB_SQUARES[chess.square(chess.square_file(move.to_square),
+                                                         chess.square_rank(move.from_square))]
+            old_type = board.piece_type_at(move.from_square)
+            self.my_pieces[old_type] &= ~frm
+            self.my_pieces[self.moved_type] |= to
+            for pt in chess.PIECE_TYPES:
+                self.their_pieces[pt] &= ~captured
+
+        self.mine = 0
+        self.theirs = 0
+        for pt in chess.PIECE_TYPES:
+            self.mine |= self.my_pieces[pt]
+            self.theirs |= self.their_pieces[pt]
+        self.occupied = self.mine | self.theirs
@@ -0,0 +1,84 @@
+import logging
+import chess
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+METRICS.PY
+Средняя потеря (ACPL) и точность ходов по ряду оценок партии.
+Во время анализа для каждого хода ученика запоминаются только оценка лучшего хода,
+оценка сыгранного хода и стадия партии (MoveRecord.score / played / phase).
+После классификации вся партия считается одним проходом NumPy: кривая вероятности
+выигрыша, потери, точность и разбивка по стадиям. Движок повторно не вызывается.
+
+Формулы как у lichess:
+    выигрыш% = 50 + 50 * (2 / (1 + exp(-0.00368208 * cp)) - 1)
+    точность = 103.1668 * exp(-0.04354 * (выигрыш% до - выигрыш% после)) - 3.1669
+Оценки ограничиваются +-CP_CEILING, чтобы мат и "+15" не раздували среднюю потерю.
+Без пакета numpy метрики не считаются (pip install numpy).
+"""
+
+OPENING, MIDDLEGAME, ENDGAME = 0, 1, 2
+PHASE_NAMES = ("Дебют", "Миттельшпиль", "Эндшпиль")
+
+OPENING_MOVES = 15   # Дебют - до 15-го хода (как проверка дебюта в check_opening)
+ENDGAME_PIECES = 6   # Эндшпиль - не больше 6 фигур на доске (без пешек и королей)
+CP_CEILING = 1000
+
+WIN_SLOPE = 0.00368208
+ACC_SCALE, ACC_DECAY, ACC_SHIFT = 103.1668, 0.04354, 3.1669
+
+_warned = False
+
+def game_phase(board):
+    pieces = chess.popcount(board.occupied & ~(board.pawns | board.kings))
+    if pieces <= ENDGAME_PIECES: return ENDGAME
+    if board.fullmove_number <= OPENING_MOVES: return OPENING
+    return MIDDLEGAME
+
+def win_percent(cp):
+    return 50 + 50 * (2 / (1 + np.exp(-WIN_SLOPE * cp)) - 1)
+
+def game_metrics(records, mate_score):
+    """
+    records - MoveRecord учеников одной партии.
+    Возвращает {цвет: суммы} для цветов, у которых есть оцененные ходы. Суммы (а не средние)
+    складываются по партиям и файлам так же, как счетчики ошибок (state.merge_stats).
+    """
+    global _warned
+    if np is None:
+        if not _warned:
+            logging.warning("Пакет numpy не установлен - точность и ACPL в отчетах не считаются.")
+            _warned = True
+        return {}
+
+    rows = [(rec.color, rec.phase,
+             rec.score.pov(rec.color).score(mate_score=mate_score),
+             rec.played.pov(rec.color).score(mate_score=mate_score))
+            for rec in records if rec.best is not None and rec.played is not None]
+    if not rows: return {}
+
+    color, phase, best, played = (np.array(col) for col in zip(*rows))
+    best = np.clip(best, -CP_CEILING, CP_CEILING)
+    played = np.clip(played, -CP_CEILING, CP_CEILING)
+    cpl = np.maximum(best - played, 0)
+    drop = np.maximum(win_percent(best) - win_percent(played), 0)
+    acc = np.clip(ACC_SCALE * np.exp(-ACC_DECAY * drop) - ACC_SHIFT, 0, 100)
+
+    result = {}
+    for side in (chess.WHITE, chess.BLACK):
+        mask = color == side
+        if not mask.any(): continue
+        moves = np.bincount(phase[mask], minlength=len(PHASE_NAMES))
+        phase_cpl = np.bincount(phase[mask], weights=cpl[mask], minlength=len(PHASE_NAMES))
+        phase_acc = np.bincount(phase[mask], weights=acc[mask], minlength=len(PHASE_NAMES))
+        result[side] = {
+            "moves": int(mask.sum()), "cpl_sum": int(cpl[mask].sum()), "acc_sum": float(acc[mask].sum()),
+            "phase_moves": {PHASE_NAMES[i]: int(n) for i, n in enumerate(moves) if n},
+            "phase_cpl": {PHASE_NAMES[i]: int(phase_cpl[i]) for i, n in enumerate(moves) if n},
+            "phase_acc": {PHASE_NAMES[i]: float(phase_acc[i]) for i, n in enumerate(moves) if n},
+        }
+    return result
@@ -1,3 +1,4 @@
+from functools import lru_cache
 import chess
 
 # === ТЕХНИЧЕСКАЯ ПОЗИЦИЯ ===
@@ -24,15 +25,49 @@ def check_technical_conversion(score_object, advantage_threshold, game_result, c
     return False
 
 # === ПЕШЕЧНЫЕ СТРУКТУРЫ ===
+# Признаки считаются целиком по битбордам пешек (маски вертикалей, без обхода полей)
+# и кэшируются по ключу (белые пешки, черные пешки): одна и та же структура
+# повторяется на десятках полуходов партии и в одинаковых дебютах разных партий.
 
-def get_pawns_per_file(board, color):
-    """Помощник: считает пешки по вертикалям."""
-    counts = [0] * 8
-    pawns = board.pieces(chess.PAWN, color)
-    for sq in pawns:
-        file_idx = chess.square_file(sq)
-        counts[file_idx] += 1
-    return counts
+class PawnStructure:
+    """
+    Пешечная структура одной стороны.
+    isolated/doubled - маски пешек, isolated_count - число изолированных пешек,
+    doubled_files - вертикали со сдвоенными пешками (бит на вертикаль).
+    """
+    __slots__ = ("isolated", "doubled", "isolated_count", "doubled_files")
+
+    def __init__(self, own):
+        occupied_files = 0
+        doubled_files = 0
+        for f, bb in enumerate(chess.BB_FILES):
+            n = chess.popcount(own & bb)
+            if n: occupied_files |= 1 << f
+            if n >= 2: doubled_files |= 1 << f
+        isolated_files = occupied_files & ~((occupied_files << 1) | (occupied_files >> 1))
+        self.doubled_files = doubled_files
+        self.isolated = own & _files_mask(isolated_files)
+        self.doubled = own & _files_mask(doubled_files)
+        self.isolated_count = chess.popcount(self.isolated)
+
+def _files_mask(files):
+    mask = 0
+    for f in range(8):
+        if files >> f & 1: mask |= chess.BB_FILES[f]
+    return mask
+
+@lru_cache(maxsize=65536)
+def pawn_structure(white_pawns, black_pawns):
+    """Структуры обеих сторон по битбордам пешек; индекс - цвет (chess.BLACK = 0, chess.WHITE = 1)."""
+    return (PawnStructure(black_pawns), PawnStructure(white_pawns))
+
+def structures(board):
+    pawns = board.pawns
+    return pawn_structure(pawns & board.occupied_co[chess.WHITE],
+                          pawns & board.occupied_co[chess.BLACK])
+
+def structure_of(board, color):
+    return structures(board)[color]
 
 def is_doubled_pawn_created(board_before, board_after, move):
     """Создание сдвоенных пешек."""
@@ -41,29 +76,14 @@ def is_doubled_pawn_created(board_before, board_after, move):
         return False
         
     color = piece.color
-    before = get_pawns_per_file(board_before, color)
-    after = get_pawns_per_file(board_after, color)
-    
-    for f in range(8):
-        if after[f] >= 2 and before[f] < 2:
-            return True
-    return False
+    before = structure_of(board_before, color).doubled_files
+    after = structure_of(board_after, color).doubled_files
+    return bool(after & ~before)
 
 def is_isolated_pawn_created(board_before, board_after, move):
     """Создание изолированной пешки."""
     color = board_before.turn 
-    
-    def count_iso(b_state):
-        counts = get_pawns_per_file(b_state, color)
-        iso = 0
-        for i in range(8):
-            if counts[i] > 0:
-                has_l = (i > 0 and counts[i-1] > 0)
-                has_r = (i < 7 and counts[i+1] > 0)
-                if not has_l and not has_r: iso += counts[i]
-        return iso
-
-    return count_iso(board_after) > count_iso(board_before)
+    return structure_of(board_after, color).isolated_count > structure_of(board_before, color).isolated_count
 
 # === ОТКРЫТЫЕ ЛИНИИ ===
 
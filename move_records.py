@@ -0,0 +1,54 @@
+import chess
+import chess.pgn
+
+"""
+MOVE_RECORDS.PY
+Компактная запись итогов анализа одного хода ученика.
+Анализ заполняет записи, а комментарии PGN, статистика и структурированный
+лог строятся из них одним шагом отрисовки (chess_analyze.render_game).
+Метки хранятся битовыми масками (registry.tags_to_mask / mask_to_tags).
+"""
+
+TECH_COMMENT = "[Не реализовал перевес +10]"
+
+class MoveRecord:
+    """
+    ply      - номер полухода от начала партии (индекс в основной линии)
+    best     - лучший ход движка (None, если позиция не оценена)
+    color    - цвет ученика
+    score    - оценка лучшего хода (PovScore)
+    played   - оценка сыгранного хода (PovScore; совпадает со score, если сыгран лучший ход)
+    phase    - стадия партии перед ходом (metrics.OPENING / MIDDLEGAME / ENDGAME)
+    loss     - потеря в сантипешках
+    nag      - NAG ошибки (0 - не ошибка)
+    tactics  - маска тактических меток; strategy - маска стратегических
+    mate_in  - упущенный мат в N (0 - нет)
+    pv       - вариант для вставки в PGN (начинается с best)
+    opening  - отчет по дебюту (строка или None)
+    tech     - не реализован решающий перевес
+    """
+    __slots__ = ("ply", "color", "best", "score", "played", "phase", "loss", "nag", "tactics", "strategy",
+                 "mate_in", "pv", "opening", "tech")
+
+    def __init__(self, ply, color=chess.WHITE, phase=0):
+        self.ply = ply
+        self.color = color
+        self.best = None
+        self.score = None
+        self.played = None
+        self.phase = phase
+        self.loss = 0
+        self.nag = 0
+        self.tactics = 0
+        self.strategy = 0
+        self.mate_in = 0
+        self.pv = ()
+        self.opening = None
+        self.tech = False
+
+    @property
+    def is_error(self):
+        return self.nag != 0 and not self.mate_in
+
+    def mate_label(self):
+        return f"Не нашел мат в {self.mate_in}"
@@ -0,0 +1,474 @@
+import io
+import os
+import re
+import queue
+import bz2
+import gzip
+import mmap
+import threading
+import functools
+import chess
+import chess.pgn
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+PGN_IO.PY
+Быстрое чтение больших PGN файлов.
+Файл отображается в память (mmap), делится на диапазоны байт по границам партий
+("[Event" после пустой строки), а диапазоны разбираются параллельно в пуле процессов.
+Партии возвращаются строго в исходном порядке.
+Сжатые файлы (.pgn.gz / .pgn.bz2 / .pgn.zst) распаковываются потоком, без временных файлов.
+Фильтр по заголовкам (game_filter, см. filters.py) проверяется до разбора ходов: ходы
+отброшенной партии пропускаются без построения дерева, а вместо партии отдается None
+(номера партий в файле не сдвигаются).
+С mainline_only боковые варианты уже размеченных PGN пропускаются при разборе: в партии
+остаются заголовки и основная линия (анализ и запись результата используют только ее).
+Результаты пишутся в фоне (AsyncWriter) с атомарным переименованием в конце.
+"""
+
+EVENT_TAG = b"[Event "
+CHUNK_BYTES = 1 << 18  # Сколько байт PGN отдавать одному процессу за раз
+READ_BLOCK = 1 << 20   # Блок чтения при потоковой распаковке
+WRITE_BUFFER = 1 << 20 # Буфер фоновой записи результатов
+
+# Команды в комментариях ([%eval 0.17], [%clk 0:03:00]) - их оставляет comments="commands"
+COMMAND_REGEX = re.compile(r"\[%[^\]]*\]")
+COMMENT_MODES = ("all", "commands", "none")
+
+# Расширение -> функция открытия (None для обычного PGN)
+COMPRESSED_SUFFIXES = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".zst": zstandard.open if zstandard else None,
+}
+PGN_SUFFIXES = (".pgn",) + tuple(".pgn" + ext for ext in COMPRESSED_SUFFIXES)
+
+_pools = {}  # число процессов -> ProcessPoolExecutor
+_pool_lock = threading.Lock()
+_worker_cpus = None  # CPU процессов разбора (affinity.setup), None - без привязки
+
+# --- ФАЙЛЫ И СЖАТИЕ ---
+
+def is_pgn_file(filename):
+    return filename.lower().endswith(PGN_SUFFIXES)
+
+def _compression_of(path):
+    """Возвращает расширение сжатия ('.gz', '.bz2', '.zst') или None."""
+    ext = os.path.splitext(path)[1].lower()
+    return ext if ext in COMPRESSED_SUFFIXES else None
+
+def pgn_base_name(path):
+    """Имя файла без .pgn и расширения сжатия: 'games.pgn.gz' -> 'games'."""
+    name = os.path.basename(path)
+    ext = _compression_of(name)
+    if ext: name = name[:-len(ext)]
+    return os.path.splitext(name)[0]
+
+def _opener(ext):
+    opener = COMPRESSED_SUFFIXES[ext]
+    if opener is None:
+        raise RuntimeError(f"Для файлов {ext} нужен пакет zstandard (pip install zstandard)")
+    return opener
+
+def open_text(path):
+    """Открывает текстовый файл на чтение (сжатые .gz/.bz2/.zst распаковываются на лету)."""
+    ext = _compression_of(path)
+    if ext is None:
+        return open(path, "r", encoding="utf-8", errors="replace", newline="")
+    return _opener(ext)(path, "rt", encoding="utf-8", errors="replace", newline="")
+
+def _output_path(path, compression):
+    """Итоговый путь и расширение сжатия (или None) для выходного файла."""
+    if not compression:
+        return path, None
+    ext = "." + compression.lstrip(".")
+    if ext not in COMPRESSED_SUFFIXES:
+        raise ValueError(f"Неизвестный формат сжатия: {compression}")
+    return path + ext, ext
+
+def _open_write(path, ext, buffering=-1, newline=None):
+    if ext is None:
+        return open(path, "w", encoding="utf-8", buffering=buffering, newline=newline)
+    return _opener(ext)(path, "wt", encoding="utf-8", newline=newline)
+
+class AsyncWriter:
+    """
+    Фоновая запись выходного файла, чтобы поток с движком не ждал диск.
+    Партии (chess.pgn.Game) и строки кладутся в ограниченную очередь, отдельный поток
+    пишет их большими блоками во временный файл <имя>.tmp. При успешном закрытии файл
+    атомарно переименовывается в итоговое имя; при ошибке временный файл удаляется,
+    поэтому недописанных *_analyze.pgn не остается. newline="" - для csv (как у open).
+
+        with pgn_io.AsyncWriter(path, compression) as out:
+            out.write_game(game)
+    """
+
+    def __init__(self, path, compression=None, queue_size=64, newline=None):
+        self.path, ext = _output_path(path, compression)
+        self.tmp_path = self.path + ".tmp"
+        self.handle = _open_write(self.tmp_path, ext, WRITE_BUFFER, newline)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name=f"writer-{os.path.basename(self.path)}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        exporter = chess.pgn.FileExporter(self.handle)
+        while True:
+            item = self.queue.get()
+            if item is None: return
+            if self.error is not None: continue  # После ошибки только разгребаем очередь
+            try:
+                if isinstance(item, str): self.handle.write(item)
+                else: item.accept(exporter)
+            except Exception as e:
+                self.error = e
+
+    def _put(self, item):
+        if self.error is not None: raise self.error
+        self.queue.put(item)
+
+    def write(self, text):
+        self._put(text)
+
+    def write_game(self, game):
+        """Партию нельзя менять после передачи: она выгружается в фоновом потоке."""
+        self._put(game)
+
+    def close(self, discard=False):
+        """Дописывает очередь и переименовывает файл (discard=True - удаляет временный файл)."""
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            self.handle.close()
+        except Exception as e:
+            self.error = self.error or e
+        if discard or self.error is not None:
+            try: os.remove(self.tmp_path)
+            except OSError: pass
+            if self.error is not None and not discard: raise self.error
+            return
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(discard=exc_type is not None)
+        return False
+
+# --- РАЗБИЕНИЕ НА ДИАПАЗОНЫ ---
+
+def _is_game_start(buf, pos):
+    """Проверяет, что '[Event' стоит в начале строки после пустой строки."""
+    i = pos - 1
+    while i >= 0 and buf[i] in b" \t\r":
+        i -= 1
+    if i < 0: return True
+    if buf[i] != 0x0A: return False  # '[Event' не в начале строки
+    i -= 1
+    while i >= 0 and buf[i] in b" \t\r":
+        i -= 1
+    return i < 0 or buf[i] == 0x0A
+
+def find_game_ranges(buf):
+    """Возвращает список (start, end) — диапазоны байт отдельных партий."""
+    size = len(buf)
+    if size == 0: return []
+    starts = [0]
+    pos = buf.find(EVENT_TAG, 1)
+    while pos != -1:
+        if _is_game_start(buf, pos): starts.append(pos)
+        pos = buf.find(EVENT_TAG, pos + len(EVENT_TAG))
+    ends = starts[1:] + [size]
+    return list(zip(starts, ends))
+
+def _iter_stream_chunks(path, ext, chunk_bytes):
+    """Потоковая распаковка: куски по границам партий в виде bytes."""
+    buf = bytearray()
+    with _opener(ext)(path, "rb") as f:
+        while True:
+            block = f.read(READ_BLOCK)
+            if block: buf += block
+            if not block or len(buf) >= chunk_bytes:
+                ranges = find_game_ranges(buf)
+                if not block:
+                    if ranges: yield bytes(buf)
+                    return
+                # Последняя партия в буфере может быть неполной - оставляем ее
+                cut = ranges[-1][0]
+                if cut > 0:
+                    yield bytes(buf[:cut])
+                    del buf[:cut]
+
+def iter_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """
+    Группирует диапазоны партий в куски примерно по chunk_bytes.
+    Граница куска всегда совпадает с границей партии.
+    Для обычных файлов кусок - (path, start, end), для сжатых - bytes.
+    """
+    ext = _compression_of(path)
+    if ext:
+        yield from _iter_stream_chunks(path, ext, chunk_bytes)
+        return
+    if os.path.getsize(path) == 0: return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ranges = find_game_ranges(mm)
+    chunk_start = None
+    for start, end in ranges:
+        if chunk_start is None: chunk_start = start
+        if end - chunk_start >= chunk_bytes:
+            yield (path, chunk_start, end)
+            chunk_start = None
+    if chunk_start is not None:
+        yield (path, chunk_start, ranges[-1][1])
+
+# --- РАЗБОР КУСКА (выполняется в процессе пула) ---
+
+def _load_bytes(chunk):
+    if isinstance(chunk, bytes): return chunk
+    path, start, end = chunk
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm[start:end]
+
+def _load_chunk(chunk):
+    return io.StringIO(_load_bytes(chunk).decode("utf-8", errors="replace"))
+
+class _GameBuilder(chess.pgn.GameBuilder):
+    """
+    GameBuilder для анализа:
+    - ходы партии, не прошедшей game_filter, пропускаются целиком (rejected);
+    - mainline_only: боковые варианты пропускаются при разборе, дерево строится только по основной линии;
+    - comments: "all" - комментарии и NAG как в файле, "commands" - только команды [%eval]/[%clk]
+      из комментариев, "none" - без комментариев и NAG.
+    """
+
+    def __init__(self, game_filter=None, mainline_only=False, comments="all"):
+        super().__init__()
+        self.game_filter = game_filter
+        self.mainline_only = mainline_only
+        self.comments = comments
+        self.rejected = False
+
+    def end_headers(self):
+        if self.game_filter is not None and not self.game_filter(self.game.headers):
+            self.rejected = True
+            return chess.pgn.SKIP
+        return None
+
+    def begin_variation(self):
+        if self.mainline_only: return chess.pgn.SKIP
+        return super().begin_variation()
+
+    def end_variation(self):
+        # read_game вызывает end_variation и в конце пропущенного варианта
+        if not self.mainline_only: super().end_variation()
+
+    def visit_comment(self, comment):
+        if self.comments == "commands": comment = " ".join(COMMAND_REGEX.findall(comment))
+        elif self.comments == "none": return
+        if comment: super().visit_comment(comment)
+
+    def visit_nag(self, nag):
+        if self.comments == "all": super().visit_nag(nag)
+
+def _parse_games(chunk, game_filter=None, mainline_only=False, comments="all"):
+    # В одном диапазоне может оказаться несколько партий (нет пустой строки между ними),
+    # поэтому читаем до конца.
+    handle = _load_chunk(chunk)
+    games = []
+    plain = game_filter is None and not mainline_only and comments == "all"
+    while True:
+        if plain:
+            g = chess.pgn.read_game(handle)
+            if g is None: break
+            games.append(g)
+            continue
+        builder = _GameBuilder(game_filter, mainline_only, comments)
+        g = chess.pgn.read_game(handle, Visitor=lambda: builder)
+        if g is None: break
+        rejected = builder.rejected or (game_filter is not None and not game_filter.plies_ok(g))
+        games.append(None if rejected else g)
+    return games
+
+def _parse_headers(chunk, game_filter=None):
+    handle = _load_chunk(chunk)
+    headers = []
+    while True:
+        h = chess.pgn.read_headers(handle)
+        if h is None: break
+        headers.append(h if game_filter is None or game_filter(h) else None)
+    return headers
+
+def _parse_headers_located(item, game_filter=None):
+    # Диапазоны партий внутри куска (как в find_game_ranges) - адреса для read_games_at
+    offset, chunk = item
+    data = _load_bytes(chunk)
+    located = []
+    for start, end in find_game_ranges(data):
+        for k, h in enumerate(_parse_headers(data[start:end], game_filter)):
+            located.append((h, (offset + start, offset + end, k)))
+    return located
+
+# --- ПЕРЕДАЧА ПАРТИЙ МЕЖДУ ПРОЦЕССАМИ ---
+# Дерево chess.pgn слишком глубокое для pickle (рекурсия на каждый полуход),
+# поэтому передаем его плоским списком узлов.
+
+def _flatten(game):
+    nodes = []
+    stack = [(game, -1)]
+    while stack:
+        node, parent_idx = stack.pop()
+        idx = len(nodes)
+        if parent_idx < 0:
+            nodes.append((-1, None, node.comment, "", tuple(node.nags)))
+        else:
+            nodes.append((parent_idx, node.move.uci(), node.comment, node.starting_comment, tuple(node.nags)))
+        for child in reversed(node.variations):
+            stack.append((child, idx))
+    return (list(game.headers.items()), nodes)
+
+def _rebuild(flat):
+    header_items, nodes = flat
+    game = chess.pgn.Game(headers=dict(header_items))
+    game.comment = nodes[0][2]
+    game.nags.update(nodes[0][4])
+    built = [game]
+    for parent_idx, uci, comment, starting_comment, nags in nodes[1:]:
+        parent = built[parent_idx]
+        built.append(parent.add_variation(chess.Move.from_uci(uci), comment=comment,
+                                          starting_comment=starting_comment, nags=nags))
+    return game
+
+def _parse_games_flat(chunk, **options):
+    return [_flatten(g) if g is not None else None for g in _parse_games(chunk, **options)]
+
+# --- ПУЛ ПРОЦЕССОВ ---
+
+def set_worker_cpus(cpus):
+    """CPU для процессов разбора, запускаемых дальше (уже запущенные привязывает affinity.setup)."""
+    global _worker_cpus
+    _worker_cpus = set(cpus) if cpus else None
+
+def _init_worker(cpus):
+    if cpus: os.sched_setaffinity(0, cpus)
+
+def _get_pool(workers):
+    # Пулы разного размера живут отдельно: другой pgn_workers у сервиса, наблюдателя
+    # или калибровки не должен останавливать пул, который еще читает файл
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                         initargs=(_worker_cpus,))
+        return pool
+
+def close_pool():
+    """Останавливает пулы процессов разбора (вызывается в конце работы)."""
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(cancel_futures=True)
+
+def _ordered_map(func, chunks, workers):
+    """Как executor.map, но держит в работе не больше 2*workers кусков (экономия памяти)."""
+    pool = _get_pool(workers)
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(func, chunk))
+        if len(pending) >= workers * 2:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# --- ПУБЛИЧНЫЙ ИНТЕРФЕЙС ---
+
+def read_games(path, workers=1, game_filter=None, mainline_only=False, comments="all"):
+    """
+    Генератор партий файла (в исходном порядке). Не прошедшие game_filter - None.
+    mainline_only и comments - см. _GameBuilder.
+    """
+    if comments not in COMMENT_MODES: raise ValueError(f"comments: {comments!r}, ожидается одно из {COMMENT_MODES}")
+    options = {"game_filter": game_filter, "mainline_only": mainline_only, "comments": comments}
+    if workers <= 1:
+        for chunk in iter_chunks(path):
+            yield from _parse_games(chunk, **options)
+        return
+    parse = functools.partial(_parse_games_flat, **options)
+    for flat_games in _ordered_map(parse, iter_chunks(path), workers):
+        for flat in flat_games:
+            yield _rebuild(flat) if flat is not None else None
+
+def _iter_located_chunks(path):
+    """iter_chunks вместе со смещением куска (для сжатых файлов - в распакованном потоке)."""
+    offset = 0
+    for chunk in iter_chunks(path):
+        if isinstance(chunk, bytes):
+            yield offset, chunk
+            offset += len(chunk)
+        else:
+            yield chunk[1], chunk
+
+def locate_headers(path, workers=1, game_filter=None):
+    """
+    Как read_headers, но вместе с адресом партии: генератор (заголовки или None, адрес).
+    Адрес - (начало, конец, k): диапазон байт партии (у сжатых файлов - в распакованном потоке)
+    и номер партии внутри диапазона. По адресам read_games_at разбирает только нужные партии.
+    """
+    if workers <= 1:
+        for item in _iter_located_chunks(path):
+            yield from _parse_headers_located(item, game_filter)
+        return
+    parse = functools.partial(_parse_headers_located, game_filter=game_filter)
+    for located in _ordered_map(parse, _iter_located_chunks(path), workers):
+        yield from located
+
+def _read_ranges(path, locations):
+    ext = _compression_of(path)
+    if ext is None:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, end, k in locations:
+                yield k, mm[start:end]
+        return
+    # Сжатый файл: распаковываем одним проходом вперед, пропущенные байты не разбираются
+    with _opener(ext)(path, "rb") as f:
+        pos = 0
+        last, data = None, b""
+        for start, end, k in locations:
+            if (start, end) != last:
+                while pos < start:
+                    skipped = f.read(min(READ_BLOCK, start - pos))
+                    if not skipped: return
+                    pos += len(skipped)
+                data = f.read(end - start)
+                pos += len(data)
+                last = (start, end)
+            yield k, data
+
+def read_games_at(path, locations, game_filter=None, mainline_only=False, comments="all"):
+    """
+    Партии по адресам locate_headers (адреса - по возрастанию): разбираются только они,
+    без повторного чтения остальных партий файла. Не прошедшие game_filter - None.
+    """
+    if comments not in COMMENT_MODES: raise ValueError(f"comments: {comments!r}, ожидается одно из {COMMENT_MODES}")
+    if not locations: return
+    for k, data in _read_ranges(path, locations):
+        games = _parse_games(data, game_filter, mainline_only, comments)
+        yield games[k] if k < len(games) else None
+
+def read_headers(path, workers=1, game_filter=None):
+    """Генератор заголовков партий файла (без разбора ходов). Не прошедшие game_filter - None."""
+    if workers <= 1:
+        for chunk in iter_chunks(path):
+            yield from _parse_headers(chunk, game_filter)
+        return
+    parse = functools.partial(_parse_headers, game_filter=game_filter)
+    for headers in _ordered_map(parse, iter_chunks(path), workers):
+        yield from headers
@@ -0,0 +1,180 @@
+import os
+import csv
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import chess
+import chess.pgn
+import chess.engine
+
+import chess_analyze
+import engine_pool
+import move_records
+import pgn_io
+import registry
+
+"""
+POSITIONS.PY
+Пакетный анализ отдельных позиций (кандидаты в задачи, критические моменты с занятий).
+Вход - EPD или CSV со строками (FEN, сыгранный ход); поддерживаются сжатые файлы.
+
+    EPD: <позиция> sm <ход>; id "<название>";     (sm - supplied move, можно pm)
+    CSV: fen,move[,id]   (строка заголовка необязательна; ход в UCI или SAN)
+
+Позиции читаются потоком и раздаются движкам пула; в работе держится не больше
+2*engine_workers позиций, поэтому файл может содержать сотни тысяч строк.
+Результат - <имя>_epd_analyze.csv / <имя>_csv_analyze.csv в папке результатов, по строке на позицию.
+"""
+
+FIELDS = ["id", "fen", "move", "best_move", "score", "loss", "nag", "mate_in", "tactics", "strategy", "error"]
+NAG_SYMBOLS = {chess.pgn.NAG_BLUNDER: "??", chess.pgn.NAG_MISTAKE: "?", chess.pgn.NAG_DUBIOUS_MOVE: "?!"}
+PROGRESS_EVERY = 1000
+
+# --- ЧТЕНИЕ ---
+
+def _parse_move(board, text):
+    text = text.strip()
+    try:
+        return board.parse_uci(text)
+    except ValueError:
+        return board.parse_san(text)
+
+def _iter_epd(handle):
+    for n, line in enumerate(handle, 1):
+        line = line.strip()
+        if not line or line.startswith("#"): continue
+        try:
+            board = chess.Board.empty()
+            ops = board.set_epd(line)
+            move = ops.get("sm") or ops.get("pm")
+            if move is None: raise ValueError("нет операции sm/pm с сыгранным ходом")
+            yield str(ops.get("id", n)), board, move, None
+        except ValueError as e:
+            yield str(n), None, None, f"{line}: {e}"
+
+def _iter_csv(handle):
+    reader = csv.reader(handle)
+    for n, row in enumerate(reader, 1):
+        if not row or not row[0].strip() or row[0].startswith("#"): continue
+        if n == 1 and row[0].strip().lower() == "fen": continue  # Заголовок
+        row_id = row[2].strip() if len(row) > 2 and row[2].strip() else str(n)
+        try:
+            if len(row) < 2: raise ValueError("ожидается fen,move")
+            board = chess.Board(row[0].strip())
+            yield row_id, board, _parse_move(board, row[1]), None
+        except ValueError as e:
+            yield row_id, None, None, f"{row[0]}: {e}"
+
+def input_kind(path):
+    """'epd' или 'csv' по расширению (без учета сжатия)."""
+    name = path.lower()
+    for ext in pgn_io.COMPRESSED_SUFFIXES:
+        if name.endswith(ext): name = name[:-len(ext)]
+    return "epd" if name.endswith(".epd") else "csv"
+
+def iter_positions(path):
+    """
+    Генератор (id, board, move, ошибка) по строкам файла.
+    Если строку не удалось разобрать, board и move - None, а ошибка - текст.
+    """
+    with pgn_io.open_text(path) as handle:
+        yield from (_iter_epd(handle) if input_kind(path) == "epd" else _iter_csv(handle))
+
+# --- АНАЛИЗ ---
+
+def analyse_position(engine, board, move, config, limit):
+    """Оценки движка и метки registry для одной позиции. Возвращает MoveRecord."""
+    rec = move_records.MoveRecord(0)
+    ev = chess_analyze.evaluate_position(engine, board, move, limit)
+    chess_analyze.classify_position(board, move, ev, config, rec)
+    return rec
+
+def _move_text(board, move):
+    # Нелегальный ход не записать в SAN - в строку ошибки идет UCI
+    try: return board.san(move)
+    except Exception: return move.uci()
+
+def result_row(row_id, board, move, rec=None, error=None):
+    row = dict.fromkeys(FIELDS, "")
+    row["id"] = row_id
+    if board is not None:
+        row["fen"] = board.fen()
+        row["move"] = _move_text(board, move)
+    if error:
+        row["error"] = error
+        return row
+    if rec.best is None:
+        row["error"] = "движок не дал лучшего хода"
+        return row
+    tactics = registry.mask_to_tags(rec.tactics)
+    if rec.mate_in: tactics = [rec.mate_label()]
+    row.update({
+        "best_move": board.san(rec.best), "score": str(rec.score.white()),
+        "loss": rec.loss, "nag": NAG_SYMBOLS.get(rec.nag, ""), "mate_in": rec.mate_in or "",
+        "tactics": "; ".join(tactics), "strategy": "; ".join(registry.mask_to_tags(rec.strategy))
+    })
+    return row
+
+def analyse_file(path, pool, config, output_folder):
+    """Анализирует все позиции файла и пишет <имя>_<epd|csv>_analyze.csv. Возвращает число позиций."""
+    limit = chess.engine.Limit(depth=config["engine_depth"])
+    base = pgn_io.pgn_base_name(path)
+    out_path = os.path.join(output_folder, f"{base}_{input_kind(path)}_analyze.csv")
+
+    def job(item):
+        row_id, board, move, error = item
+        if error: return result_row(row_id, board, move, error=error)
+        try:
+            with pool.acquire() as engine:
+                rec = analyse_position(engine, board, move, config, limit)
+            return result_row(row_id, board, move, rec)
+        except Exception as e:
+            return result_row(row_id, board, move, error=str(e))
+
+    done = 0
+    t0 = time.monotonic()
+    # newline="": переводы строк пишет сам csv (иначе в Windows получится \r\r\n)
+    out = pgn_io.AsyncWriter(out_path, config.get("output_compression"), config.get("output_queue_size", 64),
+                             newline="")
+    with out, ThreadPoolExecutor(max_workers=len(pool)) as ex:
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        pending = deque()
+
+        def drain(limit_left):
+            nonlocal done
+            while len(pending) > limit_left:
+                writer.writerow(pending.popleft().result())
+                done += 1
+                if done % PROGRESS_EVERY == 0:
+                    logging.info(f"   позиций: {done} ({done / (time.monotonic() - t0):.1f} в сек.)")
+
+        for item in iter_positions(path):
+            pending.append(ex.submit(job, item))
+            drain(len(pool) * 2)
+        drain(0)
+
+    logging.info(f"Позиций проанализировано: {done} -> {out.path}")
+    return done
+
+def run(config, paths, output_folder):
+    try:
+        logging.info("Запуск движков...")
+        pool = engine_pool.EnginePool(config)
+    except Exception as e:
+        logging.critical(f"Engine fail: {e}"); return
+
+    try:
+        for path in paths:
+            logging.info(f"=== Позиции: {os.path.basename(path)} ===")
+            try:
+                analyse_file(path, pool, config, output_folder)
+            except (OSError, RuntimeError) as e:
+                logging.error(f"Файл {path} пропущен: {e}")
+    finally:
+        pool.log_stats()
+        registry.log_check_stats()
+        registry.log_cache_stats()
+        registry.save_cache()
+        pool.close()
@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+import logging
+import threading
+import cProfile
+import pstats
+from collections import Counter
+
+"""
+PROFILER.PY
+Режим профилирования (--profile): вся команда выполняется под профайлером.
+
+    profile_mode: "sampling" - раз в profile_interval_ms снимаются стеки всех потоков
+                  (включая потоки движков и фоновой записи). Результат - profile.folded
+                  ("кадр;кадр;кадр число") для flamegraph.pl / speedscope, и отдельный
+                  profile_<стадия>.folded для каждой стадии конвейера.
+    profile_mode: "cprofile" - детерминированный cProfile основного потока, profile.pstats
+                  (смотреть: python -m pstats, snakeviz).
+
+В конце в лог пишется время по стадиям.
+"""
+
+# Стадия -> (название, функции-маркеры: стадия идет, пока маркер есть в стеке)
+STAGES = {
+    "read": ("Чтение PGN", ("pgn_io:read_games", "pgn_io:read_headers")),
+    "engine": ("Оценка движком", ("chess_analyze:evaluate_jobs",)),
+    "classify": ("Классификация", ("chess_analyze:classify_moves",)),
+    "render": ("Комментарии и статистика", ("chess_analyze:render_game",)),
+    "metrics": ("Точность и ACPL", ("metrics:game_metrics",)),
+    "write": ("Запись результатов", ("pgn_io:AsyncWriter._run",)),
+}
+
+# Ожидание в пустой очереди (поток записи без работы) не считается временем стадии
+IDLE_FRAMES = ("queue:Queue.get",)
+
+def _in_stage(frame_name, markers):
+    # Вложенные функции (потоки движков: evaluate_jobs.<locals>.worker) относятся к стадии родителя
+    return any(frame_name == m or frame_name.startswith(m + ".<locals>") for m in markers)
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+class SamplingProfiler:
+    """Снимает стеки всех потоков из отдельного потока (sys._current_frames)."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stage_ticks = Counter()
+        self.ticks = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            active = set()
+            for ident, frame in sys._current_frames().items():
+                if ident == own: continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                stack.reverse()
+                self.stacks[";".join(stack)] += 1
+                if any(fr in IDLE_FRAMES for fr in stack): continue
+                active.update(key for key, (_, markers) in STAGES.items()
+                              if any(_in_stage(fr, markers) for fr in stack))
+            self.stage_ticks.update(active)
+            self.ticks += 1
+
+    def write(self, path, stage_markers=None):
+        """Пишет стеки в формате collapsed. С stage_markers - только стеки стадии, начиная с маркера."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                if stage_markers is not None:
+                    frames = stack.split(";")
+                    start = next((i for i, fr in enumerate(frames) if _in_stage(fr, stage_markers)), None)
+                    if start is None: continue
+                    stack = ";".join(frames[start:])
+                f.write(f"{stack} {count}\n")
+
+    def stage_shares(self):
+        """{стадия: доля времени}, в которую хотя бы один поток был в этой стадии."""
+        if not self.ticks: return {}
+        return {key: self.stage_ticks[key] / self.ticks for key in STAGES}
+
+def run(func, config, output_folder):
+    """Выполняет func() под профайлером и сохраняет результаты в output_folder."""
+    mode = config.get("profile_mode", "sampling")
+    if mode == "cprofile":
+        profile = cProfile.Profile()
+        t0 = time.perf_counter()
+        try:
+            return profile.runcall(func)
+        finally:
+            path = os.path.join(output_folder, "profile.pstats")
+            profile.dump_stats(path)
+            logging.info(f"Профиль ({time.perf_counter() - t0:.1f}с): {path}")
+            stats = pstats.Stats(profile)
+            _log_stages(stats)
+            _log_top(stats)
+
+    profiler = SamplingProfiler(config.get("profile_interval_ms", 5) / 1000)
+    t0 = time.perf_counter()
+    profiler.start()
+    try:
+        return func()
+    finally:
+        profiler.stop()
+        elapsed = time.perf_counter() - t0
+        path = os.path.join(output_folder, "profile.folded")
+        profiler.write(path)
+        for key, (_, markers) in STAGES.items():
+            profiler.write(os.path.join(output_folder, f"profile_{key}.folded"), markers)
+        logging.info(f"Профиль: {profiler.ticks} снимков за {elapsed:.1f}с, стеки в {path}")
+        for key, share in profiler.stage_shares().items():
+            if share: logging.info(f"   {STAGES[key][0]}: {share:.0%} времени ({share * elapsed:.1f}с)")
+
+def _log_stages(stats):
+    # cProfile знает только имя функции (без класса): сравниваем модуль и последнее имя
+    cumulative = Counter()
+    for (filename, _, name), (_, _, _, cumtime, _) in stats.stats.items():
+        module = os.path.splitext(os.path.basename(filename))[0]
+        cumulative[(module, name)] += cumtime
+    for title, markers in STAGES.values():
+        seconds = 0
+        for marker in markers:
+            module, qualname = marker.split(":")
+            seconds += cumulative[(module, qualname.split(".")[-1])]
+        if seconds: logging.info(f"   {title}: {seconds:.1f}с (основной поток)")
+
+def _log_top(stats, limit=20):
+    logging.info("Самые дорогие функции (по общему времени):")
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in rows:
+        logging.info(f"   {cumtime:8.2f}с {tottime:8.2f}с {calls:>9} {os.path.basename(filename)}:{line} {name}")
@@ -1,48 +1,309 @@
+import os
+import json
+import time
+import logging
+import hashlib
+import importlib
+import threading
+from collections import OrderedDict
+import chess
+import chess.polyglot
+import geometry
 import tactics
 import middlegame
 
+# --- ПРЕДУСЛОВИЯ ---
+# Дешевые проверки, без которых мотив невозможен. Если предусловие ложно,
+# дорогая функция-классификатор не вызывается вообще.
+
+SLIDERS = geometry.SLIDERS
+
+def is_capture(board, move):
+    return board.is_capture(move)
+
+def gives_check(board, move):
+    return board.gives_check(move)
+
+def moves_pawn(board, move):
+    return board.piece_type_at(move.from_square) == chess.PAWN
+
+def moves_non_king(board, move):
+    return board.piece_type_at(move.from_square) != chess.KING
+
+def moves_heavy_piece(board, move):
+    return board.piece_type_at(move.from_square) in (chess.ROOK, chess.QUEEN)
+
+def lands_slider(board, move):
+    """После хода на to_square стоит слон/ладья/ферзь (включая превращение)."""
+    if move.promotion: return move.promotion in SLIDERS
+    return board.piece_type_at(move.from_square) in SLIDERS
+
+def _lines_through(square):
+    return geometry.ORTH_LINES[square], geometry.DIAG_LINES[square]
+
+def _sliders_on_lines(board, color, square):
+    orth, diag = _lines_through(square)
+    queens = board.queens & board.occupied_co[color]
+    rooks = (board.rooks & board.occupied_co[color]) | queens
+    bishops = (board.bishops & board.occupied_co[color]) | queens
+    return bool(rooks & orth or bishops & diag)
+
+def slider_behind_from_square(board, move):
+    """Вскрытие возможно, только если наша дальнобойная фигура стоит на линии с полем, откуда ушли."""
+    return _sliders_on_lines(board, board.turn, move.from_square)
+
+def slider_sees_enemy_king(board, move):
+    """Связка к королю возможна, только если после хода наша дальнобойная фигура на линии с королем."""
+    if board.is_castling(move): return True  # Ладья тоже сдвигается - не упрощаем
+    king = board.king(not board.turn)
+    if king is None: return False
+    orth, diag = _lines_through(king)
+    if lands_slider(board, move):
+        p = move.promotion or board.piece_type_at(move.from_square)
+        mask = chess.BB_SQUARES[move.to_square]
+        if p in (chess.ROOK, chess.QUEEN) and mask & orth: return True
+        if p in (chess.BISHOP, chess.QUEEN) and mask & diag: return True
+    not_from = ~chess.BB_SQUARES[move.from_square]
+    queens = board.queens & board.occupied_co[board.turn] & not_from
+    rooks = (board.rooks & board.occupied_co[board.turn] & not_from) | queens
+    bishops = (board.bishops & board.occupied_co[board.turn] & not_from) | queens
+    return bool(rooks & orth or bishops & diag)
+
+def opponent_has_pieces(board, move):
+    """Есть ли у соперника фигуры кроме пешек и короля (кого ловить)."""
+    return bool(board.occupied_co[not board.turn] & ~board.pawns & ~board.kings)
+
+# --- СПИСКИ ПРОВЕРОК: (функция, метка, предусловие или None) ---
+
 # ОШИБКИ ИГРОКА (Blunders) - Проверяем, когда оценка упала
 BLUNDER_CHECKS = [
-    (tactics.is_moving_into_danger, "Подставил фигуру"),
+    (tactics.is_moving_into_danger, "Подставил фигуру", None),
 ]
 
 # ТАКТИКА (Tactics) - Проверяем, когда оценка упала (упущенные возможности)
 TACTICAL_CHECKS = [
-    (tactics.is_fork, "Вилка"),
-    (tactics.is_pin, "Связка"),
-    (tactics.is_skewer, "Линейный удар"),
-    (tactics.is_double_check, "Двойной шах"),
-    (tactics.is_discovered_check, "Вскрытый шах"),
-    (tactics.is_discovered_attack, "Вскрытое нападение"),
-    (tactics.is_missed_hanging_piece, "Не забрал фигуру"),
-    (tactics.is_sacrifice, "Жертва"),
-    (tactics.is_removing_the_defender, "Уничтожение защитника"),
-    (tactics.is_trapped_piece, "Ловля фигуры"),
+    (tactics.is_fork, "Вилка", moves_non_king),
+    (tactics.is_pin, "Связка", slider_sees_enemy_king),
+    (tactics.is_skewer, "Линейный удар", lands_slider),
+    (tactics.is_double_check, "Двойной шах", gives_check),
+    (tactics.is_discovered_check, "Вскрытый шах", gives_check),
+    (tactics.is_discovered_attack, "Вскрытое нападение", slider_behind_from_square),
+    (tactics.is_missed_hanging_piece, "Не забрал фигуру", is_capture),
+    (tactics.is_sacrifice, "Жертва", None),
+    (tactics.is_removing_the_defender, "Уничтожение защитника", is_capture),
+    (tactics.is_trapped_piece, "Ловля фигуры", opponent_has_pieces),
 ]
 
 # СТРАТЕГИЯ (Strategy) - Проверяем ВСЕГДА (стиль игры)
 STRATEGY_CHECKS = [
-    (middlegame.is_doubled_pawn_created, "Сдвоил пешки"),
-    (middlegame.is_isolated_pawn_created, "Изолировал пешку"),
-    (middlegame.missed_open_file, "Не занял открытую линию"),
+    (middlegame.is_doubled_pawn_created, "Сдвоил пешки", moves_pawn),
+    (middlegame.is_isolated_pawn_created, "Изолировал пешку", moves_pawn),
+    (middlegame.missed_open_file, "Не занял открытую линию", moves_heavy_piece),
 ]
 
+# --- БИТОВЫЕ МАСКИ МЕТОК ---
+# Каждой метке - свой бит; порядок битов совпадает с порядком проверок,
+# поэтому mask_to_tags возвращает метки в том же порядке, что и классификаторы.
+
+TAG_LABELS = [label for _, label, _ in BLUNDER_CHECKS + TACTICAL_CHECKS + STRATEGY_CHECKS]
+TAG_BITS = {label: 1 << i for i, label in enumerate(TAG_LABELS)}
+
+def tags_to_mask(tags):
+    mask = 0
+    for t in tags: mask |= TAG_BITS[t]
+    return mask
+
+def mask_to_tags(mask):
+    return [label for label in TAG_LABELS if mask & TAG_BITS[label]]
+
+# --- СТАТИСТИКА ПРОВЕРОК ---
+# метка -> [вызовов, пропущено по предусловию, срабатываний, секунд]
+# Проверки идут параллельно (потоки движков, сервис), поэтому у каждого потока свои
+# счетчики без блокировки на горячем пути; log_check_stats их складывает.
+_thread_stats = threading.local()
+_all_stats = []  # Счетчики всех потоков
+_stats_lock = threading.Lock()
+
+def _stat(label):
+    stats = getattr(_thread_stats, "stats", None)
+    if stats is None:
+        stats = _thread_stats.stats = {}
+        with _stats_lock: _all_stats.append(stats)
+    st = stats.get(label)
+    if st is None:
+        st = stats[label] = [0, 0, 0, 0.0]
+    return st
+
+def check_stats():
+    """Сумма счетчиков всех потоков: {метка: [вызовов, пропущено, срабатываний, секунд]}."""
+    total = {}
+    with _stats_lock:
+        for stats in _all_stats:
+            for label, st in list(stats.items()):
+                acc = total.setdefault(label, [0, 0, 0, 0.0])
+                for i, v in enumerate(st): acc[i] += v
+    return total
+
+def _dispatch(func, label, precondition, board, move, call):
+    """Запускает одну проверку с учетом предусловия и замером времени."""
+    st = _stat(label)
+    if precondition is not None and not precondition(board, move):
+        st[1] += 1
+        return False
+    t0 = time.perf_counter()
+    hit = call()
+    st[3] += time.perf_counter() - t0
+    st[0] += 1
+    if hit: st[2] += 1
+    return hit
+
+def log_check_stats():
+    """Пишет в лог таблицу проверок, отсортированную по суммарному времени."""
+    stats = check_stats()
+    if not stats: return
+    logging.info("Статистика проверок (вызовов / пропущено / срабатываний / время):")
+    for label, (calls, skipped, hits, secs) in sorted(stats.items(), key=lambda kv: -kv[1][3]):
+        rate = 100.0 * hits / calls if calls else 0.0
+        avg = 1e6 * secs / calls if calls else 0.0
+        logging.info(f"   {label}: {calls} / {skipped} / {hits} ({rate:.1f}%) / {secs:.2f}с ({avg:.0f} мкс на вызов)")
+
+def reset_check_stats():
+    with _stats_lock:
+        for stats in _all_stats: stats.clear()
+
+# --- КЭШ МЕТОК ---
+# Одинаковые ошибки (один и тот же зевок в одной и той же дебютной линии) встречаются
+# у многих учеников. Метки позиции считаются один раз и берутся из LRU-кэша
+# по ключу (хэш позиции, сыгранный ход, лучший ход).
+
+class TagCache:
+    def __init__(self, size):
+        self.size = size
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            tags = self.data.get(key)
+            if tags is None:
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return list(tags)
+
+    def put(self, key, tags):
+        with self.lock:
+            self.data[key] = tuple(tags)
+            self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return 100.0 * self.hits / total if total else 0.0
+
+TAG_CACHE = None
+_cache_path = None
+
+def checks_fingerprint():
+    """
+    Отпечаток набора проверок: при изменении registry или логики детекторов (исходный код
+    модулей с проверками и предусловиями) сохраненный кэш сбрасывается.
+    """
+    checks = BLUNDER_CHECKS + TACTICAL_CHECKS + STRATEGY_CHECKS
+    parts = [f"{f.__module__}.{f.__name__}:{label}" for f, label, _ in checks]
+    digest = hashlib.sha1("|".join(parts).encode("utf-8"))
+    modules = {f.__module__ for f, _, _ in checks} | {pre.__module__ for _, _, pre in checks if pre}
+    modules |= {__name__, "geometry", "utils"}  # Общие помощники детекторов
+    for name in sorted(modules):
+        with open(importlib.import_module(name).__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def setup_cache(config, output_folder):
+    """
+    Включает кэш меток (tag_cache_size > 0) и, если задан tag_cache_file,
+    загружает его из папки результатов.
+    """
+    global TAG_CACHE, _cache_path
+    size = config.get("tag_cache_size", 100000)
+    TAG_CACHE = TagCache(size) if size > 0 else None
+    _cache_path = None
+    if TAG_CACHE is None or not config.get("tag_cache_file"):
+        return
+    _cache_path = os.path.join(output_folder, config["tag_cache_file"])
+    if not os.path.exists(_cache_path):
+        return
+    try:
+        with open(_cache_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("fingerprint") != checks_fingerprint():
+            logging.info("Набор проверок или код детекторов изменился - сохраненный кэш меток сброшен.")
+            return
+        for kind, zobrist, move, best, tags in saved["entries"][-size:]:
+            TAG_CACHE.put((kind, zobrist, move, best), tags)
+        logging.info(f"Кэш меток загружен: {len(TAG_CACHE.data)} позиций")
+    except Exception as e:
+        logging.error(f"Не удалось загрузить кэш меток {_cache_path}: {e}")
+
+def save_cache():
+    if TAG_CACHE is None or not _cache_path: return
+    with TAG_CACHE.lock:
+        entries = [list(k) + [list(v)] for k, v in TAG_CACHE.data.items()]
+    tmp = _cache_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": checks_fingerprint(), "entries": entries}, f, ensure_ascii=False)
+    os.replace(tmp, _cache_path)
+
+def log_cache_stats():
+    if TAG_CACHE is None: return
+    logging.info(f"Кэш меток: попаданий {TAG_CACHE.hits}, промахов {TAG_CACHE.misses} "
+                 f"({TAG_CACHE.hit_rate():.1f}%), позиций в кэше {len(TAG_CACHE.data)}")
+
+def _cached(kind, board, move, best_move, compute):
+    if TAG_CACHE is None:
+        return compute()
+    key = (kind, chess.polyglot.zobrist_hash(board), move.uci(), best_move.uci())
+    tags = TAG_CACHE.get(key)
+    if tags is None:
+        tags = compute()
+        TAG_CACHE.put(key, tags)
+    return tags
+
+# --- ТОЧКИ ВХОДА ---
+
 def get_strategy_tags(board, move, best_move):
     """
     Проверяет стратегические особенности хода.
     Вызывается на КАЖДОМ ходу ученика.
     """
+    return _cached("s", board, move, best_move, lambda: _strategy_tags(board, move, best_move))
+
+def _strategy_tags(board, move, best_move):
     tags = []
-    board_after = board.copy()
-    board_after.push(move)
+    after = []
+
+    def board_after():
+        # Позицию после хода строим один раз и только если она кому-то нужна
+        if not after:
+            b = board.copy()
+            b.push(move)
+            after.append(b)
+        return after[0]
 
-    for func, label in STRATEGY_CHECKS:
+    for func, label, precondition in STRATEGY_CHECKS:
         if func == middlegame.missed_open_file:
-             # Особая сигнатура для открытых линий
-             if func(board, best_move, move): tags.append(label)
+             # Особая сигнатура для открытых линий (предусловие - по лучшему ходу)
+             hit = _dispatch(func, label, precondition, board, best_move,
+                             lambda: func(board, best_move, move))
         else:
              # Стандартная сигнатура (до, после, ход)
-             if func(board_before=board, board_after=board_after, move=move): tags.append(label)
+             hit = _dispatch(func, label, precondition, board, move,
+                             lambda: func(board_before=board, board_after=board_after(), move=move))
+        if hit: tags.append(label)
     return tags
 
 def get_tactical_tags(board, move, best_move):
@@ -50,14 +311,17 @@ def get_tactical_tags(board, move, best_move):
     Проверяет тактические зевки и упущенные возможности.
     Вызывается ТОЛЬКО если оценка упала (ошибка).
     """
+    return _cached("t", board, move, best_move, lambda: _tactical_tags(board, move, best_move))
+
+def _tactical_tags(board, move, best_move):
     tags = []
 
     # 1. Ошибки игрока (Blunders)
-    for func, label in BLUNDER_CHECKS:
-        if func(board, move): tags.append(label)
+    for func, label, precondition in BLUNDER_CHECKS:
+        if _dispatch(func, label, precondition, board, move, lambda: func(board, move)): tags.append(label)
 
     # 2. Тактика (на лучшем ходе - что упустил)
-    for func, label in TACTICAL_CHECKS:
-        if func(board, best_move): tags.append(label)
+    for func, label, precondition in TACTICAL_CHECKS:
+        if _dispatch(func, label, precondition, board, best_move, lambda: func(board, best_move)): tags.append(label)
 
-    return tags
\ No newline at end of file
+    return tags
@@ -0,0 +1,250 @@
+import io
+import os
+import json
+import random
+import logging
+import tempfile
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from statistics import NormalDist, fmean, stdev
+
+import chess.pgn
+
+import chess_analyze
+import evalstore
+import filters
+import pgn_io
+import state
+
+"""
+SAMPLING.PY
+Выборочный анализ для учеников с огромной историей партий (sampling: true).
+Отчет показывает частоты ошибок, а для их оценки не нужно считать все 2000 партий:
+
+    1. По заголовкам партии каждого ученика делятся на страты:
+       контроль времени (пуля/блиц/рапид/классика) x цвет x год.
+    2. Для ученика строится случайный порядок партий, в котором любая начальная часть
+       пропорционально представляет все страты.
+    3. Партии считаются раундами по sample_batch на ученика. После раунда для каждого
+       ученика считается доверительный интервал числа ошибок за партию (с поправкой на
+       конечную совокупность). Ученик выбывает, когда полуширина интервала не больше
+       sample_ci от среднего (но не раньше sample_min_games партий) или партии кончились.
+
+Стоимость анализа растет с числом учеников, а не с числом партий. Интервалы пишутся
+в отчет. Выходные *_analyze.pgn содержат только посчитанные партии в исходном порядке.
+
+При чтении заголовков запоминаются адреса партий (pgn_io.locate_headers), так что раунд
+разбирает только свои партии, а не весь файл заново. Посчитанные партии сразу выгружаются
+во временный файл (_Spool) и в конце переписываются в *_analyze.pgn по порядку.
+"""
+
+UNKNOWN = filters.UNKNOWN
+
+# --- СТРАТЫ ---
+
+def game_year(date):
+    year = (date or UNKNOWN)[:4]
+    return year if year.isdigit() else UNKNOWN
+
+def scan_games(pgn_files, config, students_data):
+    """
+    Заголовки всех файлов: ({ученик: [(путь, номер партии, страта)]}, {(путь, номер): адрес}).
+    Страта - (контроль, цвет, год), адрес - для pgn_io.read_games_at.
+    Партии, не прошедшие фильтр (filters.py), в выборку не входят.
+    """
+    games = defaultdict(list)
+    where = {}
+    workers = config.get("pgn_workers", 1)
+    game_filter = filters.from_config(config)
+    for path in pgn_files:
+        try:
+            for i, (h, location) in enumerate(pgn_io.locate_headers(path, workers, game_filter)):
+                if h is None: continue
+                tc = filters.time_control_class(h.get("TimeControl"))
+                year = game_year(h.get("Date"))
+                for color, tag in (("white", "White"), ("black", "Black")):
+                    name = chess_analyze.normalize_name(h.get(tag, "?"))
+                    if name in students_data:
+                        games[name].append((path, i, (tc, color, year)))
+                        where[(path, i)] = location
+        except RuntimeError as e:
+            logging.error(f"Файл {os.path.basename(path)} пропущен: {e}")
+    return games, where
+
+def stratified_order(games, rng):
+    """
+    Случайный порядок партий, в котором каждая начальная часть пропорциональна стратам:
+    следующей берется партия из страты с наименьшей долей уже взятых.
+    """
+    strata = defaultdict(list)
+    for game in games: strata[game[2]].append(game)
+    for members in strata.values(): rng.shuffle(members)
+    keys = sorted(strata)
+    taken = Counter()
+    order = []
+    for _ in range(len(games)):
+        key = min((k for k in keys if taken[k] < len(strata[k])),
+                  key=lambda k: (taken[k] / len(strata[k]), -len(strata[k])))
+        order.append(strata[key][taken[key]])
+        taken[key] += 1
+    return [(path, i) for path, i, _ in order]
+
+# --- ОЦЕНКА ---
+
+def interval(values, population, z):
+    """Среднее и полуширина доверительного интервала (с поправкой на конечную совокупность)."""
+    n = len(values)
+    mean = fmean(values) if values else 0.0
+    if n < 2 or n >= population: return mean, 0.0
+    return mean, z * stdev(values) / n ** 0.5 * ((population - n) / (population - 1)) ** 0.5
+
+def game_errors(stats):
+    """Ошибки ученика в одной партии: {тип: число} плюс итог под ключом None."""
+    errors = Counter(stats["tac_errors"])
+    errors[None] = sum(stats["tac_errors"].values())
+    return errors
+
+def summarize(per_game, population, z, confidence):
+    """Итог выборки ученика для отчета: {"games", "population", "confidence", "rates": {тип: (среднее, +-)}}."""
+    types = sorted({t for errors in per_game for t in errors if t is not None})
+    rates = {"Всего ошибок": interval([e[None] for e in per_game], population, z)}
+    for t in types: rates[t] = interval([e[t] for e in per_game], population, z)
+    return {"games": len(per_game), "population": population, "confidence": confidence, "rates": rates}
+
+def is_settled(per_game, population, config, z):
+    n = len(per_game)
+    if n >= population: return True
+    if n < config.get("sample_min_games", 30): return False
+    mean, half = interval([e[None] for e in per_game], population, z)
+    return half <= config.get("sample_ci", 0.15) * mean if mean > 0 else True
+
+# --- ЗАПУСК ---
+
+def run(pgn_files, engines, config, students_data, tracking_info, output_folder):
+    """
+    Анализирует выборку партий. Возвращает ({путь: статистика учеников по файлу},
+    {ученик: итог выборки для отчета}).
+    """
+    confidence = config.get("sample_confidence", 0.95)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    batch = max(1, config.get("sample_batch", 20))
+    seed = config.get("sample_seed", 0)
+
+    games, where = scan_games(pgn_files, config, students_data)
+    orders = {name: stratified_order(g, random.Random(f"{seed}:{name}")) for name, g in games.items()}
+    population = {name: len(g) for name, g in games.items()}
+    # Итог в строке прогресса: сначала вся совокупность, после выбывания - размер выборки
+    tracking_info["student_totals"] = dict(population)
+    per_game = {name: [] for name in orders}
+    position = Counter()
+    active = set(orders)
+
+    done = set()                                  # (путь, номер) уже посчитанных партий
+    spools = {path: _Spool() for path in pgn_files}  # Посчитанные партии (с комментариями) и оценки
+    file_stats = {path: {} for path in pgn_files}
+    round_no = 0
+
+    while active:
+        round_no += 1
+        wanted = defaultdict(set)
+        for name in sorted(active):
+            order = orders[name]
+            taken = 0
+            while taken < batch and position[name] < len(order):
+                path, i = order[position[name]]
+                position[name] += 1
+                if (path, i) in done: continue  # Уже посчитана в партии другого ученика
+                wanted[path].add(i)
+                taken += 1
+        logging.info(f"Выборка, раунд {round_no}: учеников {len(active)}, партий {sum(map(len, wanted.values()))}")
+
+        for path in pgn_files:
+            indices = sorted(wanted.get(path, ()))
+            if not indices: continue
+            try:
+                games_at = chess_analyze.read_file_games_at(path, [where[(path, i)] for i in indices], config)
+                for i, g in zip(indices, games_at):
+                    if g is None: continue
+                    game_stats = {}
+                    sink = []
+                    if chess_analyze.process_game(g, engines, config, students_data, game_stats, tracking_info,
+                                                  eval_sink=sink):
+                        spools[path].add(i, g, sink[0])
+                        state.merge_stats(file_stats[path], game_stats)
+                        for raw_name, stats in game_stats.items():
+                            name = chess_analyze.normalize_name(raw_name)
+                            if name in per_game: per_game[name].append(game_errors(stats))
+                    done.add((path, i))
+            except RuntimeError as e:
+                logging.error(f"Файл {os.path.basename(path)} пропущен: {e}")
+            # Партии, которых не оказалось в файле, повторно не запрашиваем
+            done.update((path, i) for i in indices)
+
+        for name in sorted(active):
+            if position[name] >= len(orders[name]) or is_settled(per_game[name], population[name], config, z):
+                active.discard(name)
+                tracking_info["student_totals"][name] = len(per_game[name])
+                mean, half = interval([e[None] for e in per_game[name]], population[name], z)
+                logging.info(f" [=] {name}: {len(per_game[name])} из {population[name]} партий, "
+                             f"ошибок за партию {mean:.2f} ± {half:.2f}")
+
+        if active:
+            snapshot = {}
+            for stats in file_stats.values(): state.merge_stats(snapshot, stats)
+            totals = tracking_info["student_totals"]
+            progress = {n: (len(per_game.get(n, [])), totals.get(n, students_data[n])) for n in students_data}
+            chess_analyze.generate_reports(snapshot, output_folder, progress, summaries(per_game, population, z, confidence))
+
+    for path in pgn_files:
+        with spools[path] as spool:
+            write_output(path, spool, config, output_folder)
+    return file_stats, summaries(per_game, population, z, confidence)
+
+def summaries(per_game, population, z, confidence):
+    return {name: summarize(values, population[name], z, confidence) for name, values in per_game.items() if values}
+
+class _Spool:
+    """
+    Посчитанные партии одного файла во временном файле: текст PGN и строка оценок (evalstore.encode).
+    В памяти остаются только смещения, партии выгружаются сразу после анализа.
+    """
+
+    def __init__(self):
+        self.handle = tempfile.TemporaryFile()
+        self.offsets = {}  # номер партии -> (начало, конец PGN, конец оценок)
+
+    def add(self, index, game, evals):
+        text = io.StringIO()
+        game.accept(chess.pgn.FileExporter(text))
+        start = self.handle.seek(0, os.SEEK_END)
+        self.handle.write(text.getvalue().encode("utf-8"))
+        pgn_end = self.handle.tell()
+        self.handle.write(json.dumps(evalstore.encode(evals)).encode("utf-8"))
+        self.offsets[index] = (start, pgn_end, self.handle.tell())
+
+    def __iter__(self):
+        """(номер, текст PGN, оценки в виде evalstore.encode) в исходном порядке партий."""
+        for index in sorted(self.offsets):
+            start, pgn_end, end = self.offsets[index]
+            self.handle.seek(start)
+            pgn = self.handle.read(pgn_end - start).decode("utf-8")
+            yield index, pgn, json.loads(self.handle.read(end - pgn_end))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.handle.close()
+        return False
+
+def write_output(path, games, config, output_folder):
+    """Посчитанные партии файла (_Spool) - в {имя}_analyze.pgn (и оценки - в evalstore) в исходном порядке."""
+    base = pgn_io.pgn_base_name(path)
+    out_path = os.path.join(output_folder, f"{base}_analyze.pgn")
+    keep_evals = config.get("store_evals", True)
+    with pgn_io.AsyncWriter(out_path, config.get("output_compression"),
+                            config.get("output_queue_size", 64)) as out, \
+         (evalstore.EvalWriter(output_folder, path, config) if keep_evals else nullcontext()) as store:
+        for i, pgn, rows in games:
+            out.write(pgn)
+            if keep_evals: store.write_encoded(i, rows)
@@ -0,0 +1,108 @@
+import time
+import logging
+from collections import Counter
+
+import chess_analyze
+import state
+
+"""
+SCHEDULER.PY
+Справедливый порядок анализа (schedule: "fair").
+Вместо "файл за файлом" партии берутся по очереди для каждого ученика: следующим
+анализируется ученик с наименьшей долей разобранных партий (ученики из student_priority -
+раньше остальных). Внутри файла порядок партий сохраняется, поэтому выходные
+*_analyze.pgn не отличаются от обычного запуска; чередуются файлы.
+
+Раз в report_interval_sec секунд отчеты Report_<имя>.txt переписываются с пометкой
+"проанализировано N из M партий", чтобы тренер видел результаты задолго до конца пачки.
+"""
+
+class _FileStream:
+    """Открытый файл: генератор iter_file_games, его статистика и оставшиеся партии учеников."""
+
+    def __init__(self, path, engines, config, students_data, tracking_info, output_folder):
+        self.path = path
+        self.stats = {}
+        self.games = chess_analyze.iter_file_games(path, engines, config, students_data, tracking_info,
+                                                   output_folder, self.stats)
+
+    def advance(self):
+        """Анализирует следующую партию с учениками. Возвращает их имена или None (файл закончен)."""
+        return next(self.games, None)
+
+    def finish(self):
+        """Дочитывает файл до конца (оставшиеся партии без учеников только пропускаются)."""
+        for _ in self.games: pass
+
+def run(pgn_files, file_counts, engines, config, students_data, tracking_info, output_folder):
+    """
+    Анализирует все файлы в справедливом порядке.
+    file_counts - {путь: Counter(имя: партий)} из find_all_students.
+    Возвращает {путь: статистика учеников по файлу}.
+    """
+    max_open = max(1, config.get("schedule_open_files", 16))
+    interval = config.get("report_interval_sec", 300)
+    priority = [chess_analyze.normalize_name(n) for n in config.get("student_priority", [])]
+    rank = {name: i for i, name in enumerate(priority)}
+
+    remaining = {p: Counter({n: c for n, c in file_counts.get(p, {}).items() if n in students_data})
+                 for p in pgn_files}
+    done = Counter()
+    streams = {}
+    finished = {}
+    last_report = time.monotonic()
+
+    def close_stream(path):
+        stream = streams.pop(path)
+        stream.finish()
+        finished[path] = stream.stats
+        remaining[path].clear()
+
+    def pick():
+        """(ученик, файл) для следующей партии или None, если партий учеников не осталось."""
+        candidates = [n for n in students_data if any(r[n] > 0 for r in remaining.values())]
+        candidates.sort(key=lambda n: (rank.get(n, len(rank)), done[n] / max(1, students_data[n]), n))
+        for name in candidates:
+            files = [p for p in pgn_files if remaining[p][name] > 0]
+            opened = [p for p in files if p in streams]
+            if opened: return name, opened[0]
+            if len(streams) < max_open: return name, files[0]
+        return None
+
+    while True:
+        choice = pick()
+        if choice is None: break
+        name, path = choice
+        if path not in streams:
+            streams[path] = _FileStream(path, engines, config, students_data, tracking_info, output_folder)
+
+        names = streams[path].advance()
+        if names is None:
+            # Подсчет по заголовкам разошелся с партиями - файл кончился раньше
+            close_stream(path)
+            continue
+        for n in names:
+            done[n] += 1
+            if remaining[path][n] > 0: remaining[path][n] -= 1
+        if not any(remaining[path].values()):
+            close_stream(path)
+
+        if interval and time.monotonic() - last_report >= interval:
+            write_partial_reports(finished, streams, done, students_data, output_folder)
+            last_report = time.monotonic()
+
+    # Файлы без учеников (или не прочитанные при подсчете) - как в обычном запуске
+    for path in pgn_files:
+        if path in finished: continue
+        if path not in streams:
+            streams[path] = _FileStream(path, engines, config, students_data, tracking_info, output_folder)
+        close_stream(path)
+    return finished
+
+def write_partial_reports(finished, streams, done, students_data, output_folder):
+    snapshot = {}
+    for stats in finished.values(): state.merge_stats(snapshot, stats)
+    for stream in streams.values(): state.merge_stats(snapshot, stream.stats)
+    progress = {n: (done[n], students_data[n]) for n in students_data}
+    logging.info(f"Промежуточные отчеты: учеников с результатами {len(done)} из {len(students_data)}")
+    chess_analyze.generate_reports(snapshot, output_folder, progress)
@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import queue
+import socket
+import logging
+import threading
+import socketserver
+from collections import deque
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import chess.pgn
+import chess.engine
+
+import chess_analyze
+import engine_pool
+import registry
+
+"""
+SERVICE.PY
+Локальный HTTP-сервис анализа для других программ клуба (сайт, Telegram-бот).
+
+    POST /analyze?side=white|black|both&timeout=60   (тело запроса - текст PGN)
+    GET  /health
+
+Движки запускаются один раз (пул engine_workers). Партии всех запросов попадают
+в общую ограниченную очередь; каждый движок забирает их пачками до service_batch_size
+и считает позиции всех партий пачки вместе (по EVAL_BATCH за вызов, облегченный клиент
+отправляет их движку конвейером). Если очередь переполнена - ответ 503, если не успели
+к таймауту - 504: позиции просроченных партий больше не отправляются, а поиск движка,
+в пачке которого не осталось живых партий, прерывается (движок перезапускается).
+"""
+
+MAX_BODY = 5 * 1024 * 1024
+
+class ServiceBusy(Exception):
+    pass
+
+class _Task:
+    __slots__ = ("game", "students", "deadline", "result", "error", "done", "jobs", "plies", "evals")
+
+    def __init__(self, game, students, deadline):
+        self.game = game
+        self.students = students
+        self.deadline = deadline
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.jobs = []
+        self.plies = 0
+        self.evals = {}
+
+    def expired(self):
+        return time.monotonic() > self.deadline
+
+class AnalysisService:
+    def __init__(self, config):
+        self.config = config
+        self.batch_size = max(1, config.get("service_batch_size", 4))
+        self.default_timeout = config.get("service_timeout", 120)
+        self.jobs = queue.Queue(maxsize=config.get("service_queue_size", 64))
+        self.pool = engine_pool.EnginePool(config)
+        self.limit = chess.engine.Limit(depth=config["engine_depth"])
+        self.lock = threading.Lock()
+        self.current = {}  # движок -> задачи его текущей пачки
+        self.threads = []
+        for engine in self.pool.engines:
+            t = threading.Thread(target=self._worker, args=(engine,), daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    # --- ВОРКЕРЫ ---
+
+    def _worker(self, engine):
+        while True:
+            batch = [self.jobs.get()]
+            while len(batch) < self.batch_size:
+                try: batch.append(self.jobs.get_nowait())
+                except queue.Empty: break
+            stop = None in batch  # Сигнал остановки: дорабатываем пачку и выходим
+            batch = [task for task in batch if task is not None]
+
+            live = []
+            for task in batch:
+                if task.expired():
+                    task.error = TimeoutError("Истекло время ожидания в очереди")
+                    task.done.set()
+                else:
+                    live.append(task)
+            with self.lock:
+                self.current[engine] = live
+                engine.clear_cancel()
+            try:
+                self._evaluate(engine, live)
+                for task in live:
+                    if task.expired():
+                        task.error = TimeoutError("Анализ не завершен за отведенное время")
+                    else:
+                        try: task.result = self._run(task, engine)
+                        except Exception as e: task.error = e
+                    task.done.set()
+            finally:
+                with self.lock: self.current.pop(engine, None)
+            if stop: return
+
+    def _evaluate(self, engine, tasks):
+        """
+        Позиции всех партий пачки считаются вместе: по EVAL_BATCH за вызов движка, так что
+        конвейер облегченного клиента не простаивает на коротких партиях. Позиции партий,
+        которые уже не дождутся ответа, пропускаются.
+        """
+        pending = deque()
+        for task in tasks:
+            colors = {color for color, name in ((chess.WHITE, "White"), (chess.BLACK, "Black"))
+                      if chess_analyze.normalize_name(task.game.headers.get(name, "?")) in task.students}
+            task.jobs, task.plies = chess_analyze.game_jobs(task.game, colors)
+            pending.extend((task, job) for job in task.jobs)
+
+        while pending:
+            chunk = []
+            while pending and len(chunk) < chess_analyze.EVAL_BATCH:
+                task, job = pending.popleft()
+                if not task.expired(): chunk.append((task, job))
+            if not chunk: break
+            try:
+                results = chess_analyze.evaluate_positions(engine, [(board, move) for _, (_, board, move) in chunk],
+                                                           self.limit)
+            except engine_pool.EngineCancelled:
+                return  # Все партии пачки просрочены
+            for (task, (ply, _, _)), ev in zip(chunk, results): task.evals[ply] = ev
+
+    def _run(self, task, engine):
+        game = task.game
+        global_stats = {}
+        move_log = []
+        tracking_info = chess_analyze.make_tracking_info(task.students)
+        evals = chess_analyze.assemble_evals(game, task.jobs, task.evals, task.plies)
+        chess_analyze.process_game(game, engine, self.config, task.students, global_stats, tracking_info, move_log,
+                                   evals=evals)
+        return {
+            "headers": dict(game.headers),
+            "pgn": str(game),
+            "moves": move_log,
+            "stats": global_stats
+        }
+
+    # --- ЗАПРОСЫ ---
+
+    def analyze(self, pgn_text, side="both", timeout=None):
+        """Анализирует все партии из pgn_text. Блокирует поток запроса до результата."""
+        handle = StringIO(pgn_text)
+        games = []
+        while True:
+            g = chess.pgn.read_game(handle)
+            if g is None: break
+            games.append(g)
+        if not games:
+            raise ValueError("В запросе нет партий PGN")
+
+        deadline = time.monotonic() + (timeout or self.default_timeout)
+        tasks = []
+        for g in games:
+            students = {}
+            if side in ("white", "both"): students[chess_analyze.normalize_name(g.headers.get("White", "?"))] = 1
+            if side in ("black", "both"): students[chess_analyze.normalize_name(g.headers.get("Black", "?"))] = 1
+            tasks.append(_Task(g, students, deadline))
+
+        for i, task in enumerate(tasks):
+            try:
+                self.jobs.put_nowait(task)
+            except queue.Full:
+                for queued in tasks[:i]: queued.deadline = 0  # Воркер их пропустит
+                raise ServiceBusy("Очередь анализа переполнена")
+
+        for task in tasks:
+            if not task.done.wait(max(0, deadline - time.monotonic())):
+                for t in tasks: t.deadline = 0
+                self._cancel_abandoned()
+                raise TimeoutError("Анализ не завершен за отведенное время")
+            if task.error: raise task.error
+        return [t.result for t in tasks]
+
+    def _cancel_abandoned(self):
+        """Прерывает поиск движков, в пачке которых не осталось партий, ждущих ответа."""
+        with self.lock:
+            for engine, batch in self.current.items():
+                if all(task.expired() for task in batch) and not engine.cancelled:
+                    logging.info(f"[{engine.name}] Запросы пачки не дождались ответа, поиск прерван")
+                    engine.cancel()
+
+    def health(self):
+        return {"engines": len(self.pool), "queued": self.jobs.qsize(), "queue_size": self.jobs.maxsize,
+                "engine_stats": self.pool.stats()}
+
+    def close(self):
+        for _ in self.threads: self.jobs.put(None)
+        for t in self.threads: t.join(timeout=5)
+        self.pool.log_stats()
+        registry.log_check_stats()
+        registry.log_cache_stats()
+        registry.save_cache()
+        self.pool.close()
+
+# --- HTTP ---
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ChessAnalyzer/1.0"
+
+    def _reply(self, code, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items(): self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._reply(200, self.server.service.health())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/analyze":
+            self._reply(404, {"error": "not found"}); return
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_BODY:
+            self._reply(413, {"error": "PGN слишком большой"}); return
+
+        params = parse_qs(url.query)
+        side = params.get("side", ["both"])[0]
+        if side not in ("white", "black", "both"):
+            self._reply(400, {"error": "side должен быть white, black или both"}); return
+        try:
+            timeout = float(params["timeout"][0]) if "timeout" in params else None
+        except ValueError:
+            self._reply(400, {"error": "timeout должен быть числом"}); return
+
+        pgn_text = self.rfile.read(length).decode("utf-8", errors="replace")
+        try:
+            games = self.server.service.analyze(pgn_text, side, timeout)
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+        except ServiceBusy as e:
+            self._reply(503, {"error": str(e)}, {"Retry-After": "5"})
+        except TimeoutError as e:
+            self._reply(504, {"error": str(e)})
+        except Exception as e:
+            logging.error(f"Service error: {e}")
+            self._reply(500, {"error": str(e)})
+        else:
+            self._reply(200, {"games": games})
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logging.info(f"[service] {self.address_string()} {format % args}")
+
+if hasattr(socket, "AF_UNIX"):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+def serve(config):
+    socket_path = config.get("service_socket")
+    try:
+        logging.info("Запуск движков...")
+        service = AnalysisService(config)
+    except Exception as e:
+        logging.critical(f"Engine fail: {e}"); return
+
+    if socket_path:
+        if os.path.exists(socket_path): os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, _Handler)
+        where = socket_path
+    else:
+        host = config.get("service_host", "127.0.0.1")
+        port = config.get("service_port", 8765)
+        server = ThreadingHTTPServer((host, port), _Handler)
+        where = f"http://{host}:{port}"
+    server.service = service
+
+    logging.info(f"Сервис анализа запущен: {where}. Остановка: Ctrl+C")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Сервис остановлен.")
+    finally:
+        server.server_close()
+        service.close()
+        if socket_path and os.path.exists(socket_path): os.remove(socket_path)
@@ -0,0 +1,42 @@
+import hashlib
+from array import array
+
+"""
+SKETCH.PY
+Count-min sketch: приблизительный подсчет частот в фиксированной памяти.
+Используется для поиска учеников в огромных архивах (миллионы игроков), где точный
+Counter по всем именам занимает гигабайты. Оценка никогда не меньше настоящего
+числа (только завышение из-за коллизий), поэтому все игроки выше порога попадают
+в кандидаты; точные числа потом пересчитываются только для кандидатов.
+
+Обновление "консервативное": растут только минимальные счетчики, это заметно
+уменьшает завышение для редких имен.
+"""
+
+class CountMinSketch:
+    def __init__(self, width=1 << 20, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def _positions(self, key):
+        # Две независимые половины хеша дают depth позиций (h1 + i*h2)
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Добавляет count вхождений key. Возвращает новую оценку частоты."""
+        positions = self._positions(key)
+        estimate = min(row[p] for row, p in zip(self.rows, positions)) + count
+        for row, p in zip(self.rows, positions):
+            if row[p] < estimate: row[p] = estimate
+        return estimate
+
+    def estimate(self, key):
+        return min(row[p] for row, p in zip(self.rows, self._positions(key)))
+
+    @property
+    def memory_mb(self):
+        return self.depth * self.width * self.rows[0].itemsize / (1 << 20)
@@ -0,0 +1,43 @@
+import os
+import json
+import threading
+
+"""
+SLOWLOG.PY
+Журнал медленных позиций (slow_positions.jsonl в папке результатов).
+Всегда включен: если вызов движка дольше slow_engine_sec или классификация хода
+дольше slow_classify_sec, в журнал пишется строка JSON с FEN, партией, ходом,
+глубиной, узлами и временем. Из журнала удобно собирать бенчмарки на реальных
+тяжелых позициях. Порог 0 отключает соответствующую проверку.
+"""
+
+SLOW_FILE = "slow_positions.jsonl"
+
+_path = None
+_engine_sec = 0
+_classify_sec = 0
+_lock = threading.Lock()
+
+def setup(config, output_folder):
+    global _path, _engine_sec, _classify_sec
+    _path = os.path.join(output_folder, SLOW_FILE)
+    _engine_sec = config.get("slow_engine_sec", 10)
+    _classify_sec = config.get("slow_classify_sec", 0.5)
+
+def _write(entry):
+    if _path is None: return
+    line = json.dumps(entry, ensure_ascii=False)
+    with _lock, open(_path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+def engine(game_id, ply, board, move, elapsed, info):
+    """Проверка одного вызова движка. info - результат analyse (для глубины и узлов)."""
+    if not _engine_sec or elapsed < _engine_sec: return
+    _write({"kind": "engine", "game": game_id, "ply": ply, "fen": board.fen(), "move": move.uci(),
+            "depth": info.get("depth"), "nodes": info.get("nodes"), "elapsed": round(elapsed, 3)})
+
+def classify(game_id, ply, board, move, elapsed):
+    """Проверка классификации одного хода (тактика, стратегия, дебют)."""
+    if not _classify_sec or elapsed < _classify_sec: return
+    _write({"kind": "classify", "game": game_id, "ply": ply, "fen": board.fen(), "move": move.uci(),
+            "elapsed": round(elapsed, 3)})
@@ -0,0 +1,123 @@
+import os
+import json
+import logging
+from collections import Counter
+
+"""
+STATE.PY
+Сохраненные результаты анализа по файлам (analysis_state.json в папке результатов).
+Позволяет пересчитывать отчеты и анализировать только новые/измененные файлы.
+
+Формат analysis_state.json:
+{"files": {путь: {"mtime": .., "size": .., "players": {имя: партий},
+                  "students": [ученики, для которых файл проанализирован],
+                  "stats": {ученик: статистика}}},
+ "game_filter": фильтр партий (filters.py), с которым считались результаты}
+
+Кэш подсчета игроков по заголовкам (headers_cache.json), чтобы поиск учеников
+не перечитывал неизмененные архивы:
+{путь: {"mtime": .., "size": .., "filter": [имена] или null, "games": фильтр партий (filters.py) или null,
+        "players": {имя: партий}}}
+"""
+
+STATE_FILE = "analysis_state.json"
+HEADERS_FILE = "headers_cache.json"
+COUNTER_FIELDS = ("op_errors", "tac_errors", "strat_stats", "phase_moves", "phase_cpl", "phase_acc")
+
+def new_student_stats():
+    return {
+        "games": 0, "op_errors": Counter(), "tac_errors": Counter(),
+        "strat_stats": Counter(), "tech_errors": 0,
+        # Суммы для ACPL и точности (metrics.py), в т.ч. по стадиям партии
+        "moves": 0, "cpl_sum": 0, "acc_sum": 0.0,
+        "phase_moves": Counter(), "phase_cpl": Counter(), "phase_acc": Counter()
+    }
+
+def merge_stats(target, source):
+    """Добавляет статистику source ({ученик: данные}) в target."""
+    for name, data in source.items():
+        dst = target.setdefault(name, new_student_stats())
+        for key, value in data.items():
+            if isinstance(value, dict):
+                dst.setdefault(key, Counter()).update(value)
+            else:
+                dst[key] = dst.get(key, 0) + value
+    return target
+
+def _stats_from_json(stats):
+    for data in stats.values():
+        for key in COUNTER_FIELDS:
+            data[key] = Counter(data.get(key, {}))
+    return stats
+
+def file_signature(path):
+    st = os.stat(path)
+    return st.st_mtime, st.st_size
+
+def load_state(output_folder):
+    path = os.path.join(output_folder, STATE_FILE)
+    if not os.path.exists(path):
+        return {"files": {}}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception as e:
+        logging.error(f"Не удалось прочитать {path}: {e}. Начинаю с нуля.")
+        return {"files": {}}
+    for entry in state.get("files", {}).values():
+        _stats_from_json(entry.get("stats", {}))
+    state.setdefault("files", {})
+    return state
+
+def _save_json(data, output_folder, filename):
+    """Атомарная запись: сначала во временный файл, потом переименование."""
+    path = os.path.join(output_folder, filename)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def save_state(state, output_folder):
+    _save_json(state, output_folder, STATE_FILE)
+
+def load_headers_cache(output_folder):
+    path = os.path.join(output_folder, HEADERS_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"Не удалось прочитать {path}: {e}. Заголовки будут прочитаны заново.")
+        return {}
+
+def save_headers_cache(cache, output_folder):
+    _save_json(cache, output_folder, HEADERS_FILE)
+
+def cached_players(cache, path, target_filter, game_key=None):
+    """Подсчет игроков из кэша или None, если файл изменился или фильтр (имен или партий) другой."""
+    entry = cache.get(path)
+    if entry is None: return None
+    mtime, size = file_signature(path)
+    key = sorted(target_filter) if target_filter is not None else None
+    if entry.get("mtime") != mtime or entry.get("size") != size or entry.get("filter") != key:
+        return None
+    if entry.get("games") != game_key: return None
+    return Counter(entry.get("players", {}))
+
+def store_players(cache, path, target_filter, player_counts, game_key=None):
+    mtime, size = file_signature(path)
+    cache[path] = {"mtime": mtime, "size": size,
+                   "filter": sorted(target_filter) if target_filter is not None else None,
+                   "games": game_key,
+                   "players": dict(player_counts)}
+
+def aggregate_stats(state, names=None):
+    """Суммирует статистику по всем файлам (только для names, если заданы)."""
+    total = {}
+    for entry in state["files"].values():
+        stats = entry.get("stats", {})
+        if names is not None:
+            stats = {n: d for n, d in stats.items() if n in names}
+        merge_stats(total, stats)
+    return total
@@ -1,4 +1,5 @@
 import chess
+import geometry
 from utils import PIECE_VALUES
 
 # --- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ---
@@ -208,44 +209,38 @@ def is_fork(board, move):
     return targets >= 2
 
 def is_skewer(board, move):
+    """
+    Линейный удар: дальнобойная фигура бьет ценную фигуру, а за ней (рентгеном)
+    стоит более дешевая фигура соперника на той же линии.
+    """
+    pos = geometry.AfterMove(board, move)
     attacker_sq = move.to_square
-    sandbox = board.copy()
-    sandbox.push(move)
-    attacker_type = sandbox.piece_type_at(attacker_sq)
-    if attacker_type not in [chess.BISHOP, chess.ROOK, chess.QUEEN]: return False
-    opponent_color = sandbox.turn
-    direct_attacks = sandbox.attacks(attacker_sq)
-    for front_sq in direct_attacks:
-        front_piece = sandbox.piece_at(front_sq)
-        if front_piece and front_piece.color == opponent_color:
-            temp = sandbox.remove_piece_at(front_sq)
-            xray_attacks = sandbox.attacks(attacker_sq)
-            skewer_found = False
-            for back_sq in xray_attacks:
-                back_piece = sandbox.piece_at(back_sq)
-                if back_piece and back_piece.color == opponent_color:
-                    val_front = PIECE_VALUES.get(front_piece.piece_type, 0)
-                    val_back = PIECE_VALUES.get(back_piece.piece_type, 0)
-                    if val_front > val_back or front_piece.piece_type == chess.KING:
-                        skewer_found = True
-            sandbox.set_piece_at(front_sq, temp)
-            if skewer_found: return True
+    attacker_type = pos.moved_type
+    if attacker_type not in geometry.SLIDERS: return False
+    xray = geometry.xray_attacks(attacker_sq, attacker_type, pos.occupied, pos.theirs)
+    for back_sq in chess.scan_forward(xray & pos.theirs):
+        front_sq = chess.lsb(geometry.BETWEEN[attacker_sq][back_sq] & pos.theirs)
+        front_type = board.piece_type_at(front_sq)
+        back_type = board.piece_type_at(back_sq)
+        if front_type == chess.KING or PIECE_VALUES.get(front_type, 0) > PIECE_VALUES.get(back_type, 0):
+            return True
     return False
 
 def is_pin(board, move):
-    sandbox = board.copy()
-    sandbox.push(move)
-    op_color = sandbox.turn
-    my_attacks = sandbox.attacks(move.to_square)
-    for sq in my_attacks:
-        target = sandbox.piece_at(sq)
-        if target and target.color == op_color:
-            if sandbox.pin(op_color, sq) != chess.BB_ALL: return True
-    attackers = sandbox.attackers(op_color, move.to_square)
-    for sq in attackers:
-        pin_mask = sandbox.pin(op_color, sq)
-        if pin_mask != chess.BB_ALL:
-            if not (pin_mask & chess.BB_SQUARES[move.to_square]): return True
+    pos = geometry.AfterMove(board, move)
+    op_color = not board.turn
+    king = board.king(op_color)
+    if king is None: return False
+    pins = geometry.pinned_to_king(king, pos.occupied, pos.theirs, pos.my_pieces)
+    if not pins: return False
+    # Наша фигура бьет связанную фигуру
+    my_attacks = geometry.piece_attacks(move.to_square, pos.moved_type, board.turn, pos.occupied)
+    for sq in chess.scan_forward(my_attacks & pos.theirs):
+        if sq in pins: return True
+    # Связанная фигура не может побить нашу (поле хода не на линии связки)
+    attackers = geometry.attackers_mask(move.to_square, pos.occupied, pos.their_pieces, op_color)
+    for sq in chess.scan_forward(attackers):
+        if sq in pins and not (pins[sq] & chess.BB_SQUARES[move.to_square]): return True
     return False
 
 def is_double_check(board, move):
@@ -263,20 +258,20 @@ def is_discovered_check(board, move):
     return False
 
 def is_discovered_attack(board, move):
+    """
+    Вскрытое нападение: фигура ушла с линии, и наша дальнобойная фигура за ней
+    теперь бьет фигуру соперника (кроме короля и пешек).
+    """
     from_sq = move.from_square
-    sandbox = board.copy()
-    sandbox.push(move)
-    my_color = not sandbox.turn 
-    op_color = sandbox.turn     
-    for sq, piece in sandbox.piece_map().items():
-        if piece.color == op_color:
-            if piece.piece_type in [chess.KING, chess.PAWN]: continue
-            attackers = sandbox.attackers(my_color, sq)
-            for atk_sq in attackers:
-                if atk_sq == move.to_square: continue
-                atk_piece = sandbox.piece_at(atk_sq)
-                if atk_piece.piece_type not in [chess.BISHOP, chess.ROOK, chess.QUEEN]: continue
-                between_mask = chess.between(atk_sq, sq)
-                if (between_mask & (1 << from_sq)): 
-                    return True
-    return False
\ No newline at end of file
+    pos = geometry.AfterMove(board, move)
+    if pos.occupied & chess.BB_SQUARES[from_sq]: return False
+    targets = pos.theirs & ~pos.their_pieces[chess.KING] & ~pos.their_pieces[chess.PAWN]
+    if not targets: return False
+    orth = (pos.my_pieces[chess.ROOK] | pos.my_pieces[chess.QUEEN]) & geometry.ORTH_LINES[from_sq]
+    diag = (pos.my_pieces[chess.BISHOP] | pos.my_pieces[chess.QUEEN]) & geometry.DIAG_LINES[from_sq]
+    for atk_sq in chess.scan_forward((orth | diag) & ~chess.BB_SQUARES[move.to_square]):
+        if geometry.BETWEEN[atk_sq][from_sq] & pos.occupied: continue
+        target = geometry.first_beyond(atk_sq, from_sq, pos.occupied)
+        if target is not None and chess.BB_SQUARES[target] & targets:
+            return True
+    return False
@@ -0,0 +1,154 @@
+import subprocess
+from collections import deque
+import chess
+import chess.engine
+from chess.engine import PovScore, Cp, Mate, EngineTerminatedError, EngineError
+
+"""
+UCI_CLIENT.PY
+Облегченный UCI-клиент для анализа на фиксированную глубину (engine_client: "lean").
+В отличие от chess.engine.SimpleEngine не разбирает каждую строку info: во время счета
+строки только откладываются, а в конце разбираются последняя оценка (с глубиной,
+узлами и временем) и последний корректный PV. Результат - словарь {"score": PovScore, "pv": [Move, ...]} с той же
+семантикой, что у python-chess (оценка с точки зрения стороны, которая ходит;
+mate N -> Mate(N); root_moves -> searchmoves).
+
+analyse_many() отправляет движку несколько пар position/go подряд, не дожидаясь
+bestmove предыдущей: пока Python разбирает ответ, движок уже считает следующую позицию.
+"""
+
+class LeanEngine:
+    def __init__(self, command, pipeline=2):
+        self.pipeline = max(1, pipeline)
+        self.process = subprocess.Popen([command], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.options = set()
+        self._send("uci")
+        for line in self._lines("uciok"):
+            if line.startswith("option name "):
+                self.options.add(line[12:].split(" type ")[0].strip())
+
+    # --- ПРОТОКОЛ ---
+
+    def _send(self, *lines):
+        try:
+            self.process.stdin.write("\n".join(lines) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError, OSError):
+            raise EngineTerminatedError("engine process died unexpectedly")
+
+    def _readline(self):
+        line = self.process.stdout.readline()
+        if not line:
+            raise EngineTerminatedError(f"engine process died unexpectedly (exit code: {self.process.poll()})")
+        return line.rstrip("\r\n")
+
+    def _lines(self, until):
+        """Строки ответа до строки, начинающейся с until (она не возвращается)."""
+        while True:
+            line = self._readline()
+            if line.startswith(until): return
+            yield line
+
+    def _sync(self):
+        self._send("isready")
+        for _ in self._lines("readyok"): pass
+
+    def configure(self, options):
+        for name, value in options.items():
+            if name not in self.options:
+                raise EngineError(f"engine does not support option {name}")
+            self._send(f"setoption name {name} value {value}")
+        self._sync()
+
+    # --- КОМАНДЫ ---
+
+    @staticmethod
+    def _position(board):
+        # Как в python-chess: корень партии + ходы, чтобы движок видел повторения
+        safe_history = all(board.move_stack)
+        root = board.root() if safe_history else board
+        fen = root.fen(shredder=board.chess960, en_passant="fen")
+        cmd = "position startpos" if fen == chess.STARTING_FEN else f"position fen {fen}"
+        if safe_history and board.move_stack:
+            cmd += " moves " + " ".join(m.uci() for m in board.move_stack)
+        return cmd
+
+    @staticmethod
+    def _go(limit, root_moves=None):
+        cmd = ["go"]
+        if limit.depth is not None: cmd.append(f"depth {int(limit.depth)}")
+        if limit.nodes is not None: cmd.append(f"nodes {int(limit.nodes)}")
+        if limit.time is not None: cmd.append(f"movetime {max(1, int(round(limit.time * 1000)))}")
+        if limit.mate is not None: cmd.append(f"mate {int(limit.mate)}")
+        if root_moves is not None:
+            cmd.append("searchmoves " + " ".join(m.uci() for m in root_moves) if root_moves else "searchmoves 0000")
+        return " ".join(cmd)
+
+    def _result(self, board):
+        score_line = None
+        pv_lines = []
+        for line in self._lines("bestmove"):
+            if not line.startswith("info ") or line.startswith("info string"): continue
+            if " score " in line: score_line = line
+            if " pv " in line: pv_lines.append(line)
+
+        info = {}
+        if score_line is not None:
+            kind, value = score_line.split(" score ", 1)[1].split()[:2]
+            info["score"] = PovScore(Cp(int(value)) if kind == "cp" else Mate(int(value)), board.turn)
+            # Глубина, узлы и время (в секундах, как в python-chess) - для журнала медленных позиций
+            fields = score_line.split(" pv ", 1)[0].split()
+            for key in ("depth", "nodes", "time"):
+                if key in fields:
+                    value = int(fields[fields.index(key) + 1])
+                    info[key] = value / 1000 if key == "time" else value
+        # Последний PV, который разбирается на доске (как info.update в python-chess)
+        for line in reversed(pv_lines):
+            try:
+                pv = []
+                b = board.copy(stack=False)
+                for token in line.split(" pv ", 1)[1].split():
+                    if not chess.engine.UCI_REGEX.match(token): break
+                    pv.append(b.push_uci(token))
+                info["pv"] = pv
+                break
+            except ValueError:
+                continue
+        return info
+
+    # --- АНАЛИЗ ---
+
+    def analyse(self, board, limit, multipv=None, root_moves=None, **kwargs):
+        return self.analyse_many([(board, limit, root_moves)])[0]
+
+    def analyse_many(self, requests):
+        """
+        requests - список (board, limit, root_moves). Возвращает список результатов в том же порядке.
+        В движке одновременно стоит не больше pipeline заданий.
+        """
+        results = []
+        sent = deque()
+        for board, limit, root_moves in requests:
+            if len(sent) >= self.pipeline:
+                results.append(self._result(sent.popleft()))
+            self._send(self._position(board), self._go(limit, root_moves))
+            sent.append(board)
+        while sent:
+            results.append(self._result(sent.popleft()))
+        return results
+
+    # --- ЗАВЕРШЕНИЕ ---
+
+    def quit(self):
+        try:
+            self._send("quit")
+            self.process.wait(timeout=5)
+        except (EngineTerminatedError, subprocess.TimeoutExpired):
+            self.close()
+
+    def close(self):
+        """Немедленно убивает процесс (используется watchdog'ом)."""
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
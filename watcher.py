@@ -0,0 +1,160 @@
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import chess_analyze
+import engine_pool
+import filters
+import pgn_io
+import registry
+import state
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+"""
+WATCHER.PY
+Режим наблюдения: программа не завершается, а следит за input_folder.
+Движки запускаются один раз и остаются "прогретыми". Анализируются только новые
+и измененные файлы, после чего переписываются отчеты затронутых учеников.
+Используется inotify (Linux, пакет inotify_simple), иначе - периодический опрос папки.
+"""
+
+class _PollWaiter:
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def close(self):
+        pass
+
+class _InotifyWaiter:
+    def __init__(self, folder):
+        self.inotify = INotify()
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE
+        self.inotify.add_watch(folder, mask)
+
+    def wait(self, timeout):
+        # read_delay собирает пачку событий (копирование нескольких файлов) в одну синхронизацию
+        self.inotify.read(timeout=int(timeout * 1000), read_delay=500)
+
+    def close(self):
+        self.inotify.close()
+
+def _make_waiter(folder):
+    if INotify is not None:
+        try:
+            waiter = _InotifyWaiter(folder)
+            logging.info("Наблюдение за папкой: inotify")
+            return waiter
+        except OSError as e:
+            logging.warning(f"inotify недоступен ({e}), переключаюсь на опрос папки")
+    logging.info("Наблюдение за папкой: опрос")
+    return _PollWaiter()
+
+def _scan(input_folder):
+    files = {}
+    for path in chess_analyze.get_pgn_files(input_folder):
+        try: files[path] = state.file_signature(path)
+        except OSError: continue  # Файл удалили между listdir и stat
+    return files
+
+def sync(app_state, pool, config, input_folder, output_folder):
+    """
+    Одна синхронизация: находит новые/измененные/удаленные файлы, анализирует нужные
+    и обновляет отчеты затронутых учеников. Возвращает True, если что-то изменилось.
+    """
+    settle = config.get("watch_settle_sec", 2)
+    entries = app_state["files"]
+    files = _scan(input_folder)
+    now = time.time()
+
+    removed = [p for p in entries if p not in files]
+    changed = [p for p, sig in files.items()
+               if (p not in entries or (entries[p]["mtime"], entries[p]["size"]) != tuple(sig))
+               and now - sig[0] >= settle]  # Файл еще дописывается - подождем
+    if not removed and not changed:
+        return False
+
+    affected = set()
+    for p in removed:
+        logging.info(f"Файл удален: {p}")
+        affected |= set(entries.pop(p).get("stats", {}))
+
+    target_filter = chess_analyze.get_target_filter(config)
+    new_counts = {}
+    for p in changed:
+        try: new_counts[p] = chess_analyze.count_players(p, config, target_filter)
+        except Exception as e: logging.error(f"Не удалось прочитать {p}: {e}")
+
+    total = Counter()
+    for p in files:
+        if p in new_counts: total.update(new_counts[p])
+        elif p in entries: total.update(entries[p]["players"])
+    students_data = chess_analyze.select_students(total, config)
+
+    # Измененные файлы + старые файлы, где появились новые ученики
+    todo = set(new_counts)
+    for p, entry in entries.items():
+        if p in files and p not in new_counts:
+            needed = {n for n in entry["players"] if n in students_data}
+            if not needed <= set(entry["students"]): todo.add(p)
+
+    tracking_info = chess_analyze.make_tracking_info(students_data)
+
+    def job(path):
+        with pool.acquire() as engine:
+            return path, chess_analyze.analyze_file(path, engine, config, students_data, tracking_info, output_folder)
+
+    with ThreadPoolExecutor(max_workers=len(pool)) as ex:
+        for path, file_stats in ex.map(job, sorted(todo)):
+            affected |= set(entries.get(path, {}).get("stats", {})) | set(file_stats)
+            # Пустой подсчет (файл без партий или все отброшены фильтром) - тоже новый подсчет
+            counts = new_counts[path] if path in new_counts else Counter(entries[path]["players"])
+            chess_analyze.record_file(app_state, path, config, students_data, file_stats, counts, files[path])
+
+    state.save_state(app_state, output_folder)
+    registry.save_cache()
+    if affected:
+        chess_analyze.generate_reports(state.aggregate_stats(app_state, affected), output_folder)
+    logging.info(f"Синхронизация завершена: файлов {len(todo)}, отчетов {len(affected)}")
+    return True
+
+def watch(config, input_folder, output_folder):
+    app_state = state.load_state(output_folder)
+    interval = config.get("watch_interval", 5)
+    game_key = filters.filter_key(config)
+    if app_state["files"] and app_state.get("game_filter") != game_key:
+        # Сохраненные результаты посчитаны по другому набору партий
+        logging.info("Фильтр партий изменился: все файлы будут проанализированы заново")
+        app_state["files"] = {}
+    app_state["game_filter"] = game_key
+
+    try:
+        logging.info("Запуск движков...")
+        pool = engine_pool.EnginePool(config)
+    except Exception as e:
+        logging.critical(f"Engine fail: {e}"); return
+
+    waiter = _make_waiter(input_folder)
+    logging.info(f"Режим наблюдения за '{input_folder}'. Остановка: Ctrl+C")
+    try:
+        while True:
+            try:
+                sync(app_state, pool, config, input_folder, output_folder)
+            except Exception as e:
+                # Один плохой файл не должен останавливать наблюдение: следующий цикл попробует снова
+                logging.exception(f"Ошибка синхронизации: {e}")
+            waiter.wait(interval)
+    except KeyboardInterrupt:
+        logging.info("Наблюдение остановлено.")
+    finally:
+        waiter.close()
+        pool.log_stats()
+        registry.log_check_stats()
+        registry.log_cache_stats()
+        registry.save_cache()
+        pool.close()
+        pgn_io.close_pool()